@@ -0,0 +1,253 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+PA_LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<body>
+    <div class="bg_top_newtwork">Pearl Abyss</div>
+    <a class="btn_steam_login" href="/steam/login">Sign in with Steam</a>
+</body>
+</html>
+"""
+
+PA_PROFILE_PAGE = """<!DOCTYPE html>
+<html>
+<body>
+    <div class="bg_top_newtwork">Pearl Abyss</div>
+    <p>Profile</p>
+</body>
+</html>
+"""
+
+STEAM_LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<body>
+    <div class="newlogindialog_LoginForm_3Tsg9">
+        <input type="text" id="username">
+        <input type="password" id="password">
+    </div>
+    <button class="newlogindialog_SubmitButton_2QgFE" onclick="login()">Sign in</button>
+    <div id="status"></div>
+    <script>
+        function login() {
+            const status = document.getElementById("status");
+
+            if (document.getElementById("username").value === "wrong") {
+                status.innerHTML = '<div class="newlogindialog_Danger_1-HwJ">Error</div>';
+                return;
+            }
+
+            status.innerHTML = '<div class="newlogindialog_ConfirmationContainer_2aZnk">Confirm</div>';
+
+            // Emulate the confirmation on the mobile app
+            setTimeout(() => {
+                status.innerHTML += '<div class="throbber_Throbber_7MdwT"></div>';
+                setTimeout(() => { location.href = "/steam/openid"; }, 100);
+            }, %(confirm_delay)d);
+        }
+    </script>
+</body>
+</html>
+"""
+
+STEAM_OPENID_PAGE = """<!DOCTYPE html>
+<html>
+<body>
+    <div class="throbber_Throbber_7MdwT"></div>
+    <input type="image" id="imageLogin" onclick="location.href = '/steam/openid/complete'">
+</body>
+</html>
+"""
+
+COUPON_PAGE = """<!DOCTYPE html>
+<html>
+<body>
+    <div class="bg_top_newtwork">Pearl Abyss</div>
+    <form id="couponForm" action="/en-US/Shop/Coupon/Use" method="post">
+        <input type="hidden" name="__RequestVerificationToken" value="%(token)s">
+        <div class="custom_input">
+            <input type="text" name="couponCode1" maxlength="4">
+            <input type="text" name="couponCode2" maxlength="4">
+            <input type="text" name="couponCode3" maxlength="4">
+            <input type="text" name="couponCode4" maxlength="4">
+        </div>
+        <button type="button" id="submitCoupon">Redeem</button>
+    </form>
+    <script>
+        document.getElementById("submitCoupon").addEventListener("click", async () => {
+            const form = document.getElementById("couponForm");
+            const response = await fetch(form.action, { method: "POST", body: new URLSearchParams(new FormData(form)) });
+            const message = await response.text();
+
+            alert(message);
+
+            if (message === "%(success)s") {
+                location.href = "/en-US/WebItemStorage/Complete";
+            }
+        });
+    </script>
+</body>
+</html>
+"""
+
+COMPLETE_PAGE = """<!DOCTYPE html>
+<html>
+<body>
+    <div class="bg_top_newtwork">Pearl Abyss</div>
+    <p>Complete</p>
+</body>
+</html>
+"""
+
+
+class Server:
+    """ Local stand-in for the Garmoth API, the Steam login and the BlackDesert coupon page """
+
+    TOKEN = "benchmark-token"
+
+    SUBMIT_DIALOG = {
+        "Success": "You have successfully redeemed the coupon code.",
+        "Already Redeemed": "This coupon code cannot be used multiple times.",
+        "Invalid": "You cannot use this coupon code."
+    }
+
+    # The first segment of a coupon code decides its status
+    COUPON_STATUS = {
+        "AAAA": "Success",
+        "BBBB": "Already Redeemed"
+    }
+
+    def __init__(self, latency: float = 0, confirm_delay: float = 0):
+        """
+        Initializes a new instance of the Server class
+
+        :param latency: Number of seconds added to every response, to emulate the network
+        :param confirm_delay: Number of seconds before the Steam login is confirmed
+        """
+
+        self.latency = latency
+        self.confirm_delay = confirm_delay
+        self.coupons = list()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(handler=self)
+
+            def do_POST(self):
+                server.handle(handler=self)
+
+        self.http_server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.http_server.server_port}"
+
+        self.api = f"{self.url}/api/coupons"
+        self.login_page = f"{self.url}/Member/Login"
+        self.coupon_redeem_page = f"{self.url}/en-US/Shop/Coupon/"
+
+    def __enter__(self):
+        threading.Thread(
+            target=self.http_server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+    def respond(self, handler: BaseHTTPRequestHandler, body: str, status: int = 200,
+                content_type: str = "text/html", headers: dict = None) -> None:
+        """
+        Sends a response to the request
+
+        :param handler: Handler of the request
+        :param body: Body of the response
+        :param status: Status code of the response
+        :param content_type: Content type of the response
+        :param headers: Dictionary with additional response headers
+        :returns: None
+        """
+
+        body = body.encode()
+
+        handler.send_response(status)
+        handler.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+
+        for name, value in (headers or dict()).items():
+            handler.send_header(name, value)
+
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        """
+        Routes the request to the page it requested
+
+        :param handler: Handler of the request
+        :returns: None
+        """
+
+        time.sleep(self.latency)
+
+        path = urlparse(handler.path).path
+        logged_in = "session=benchmark" in handler.headers.get("Cookie", "")
+
+        if path == "/api/coupons":
+            self.respond(
+                handler=handler, content_type="application/json",
+                body=json.dumps([{"code": coupon} for coupon in self.coupons]))
+
+        elif path == "/Member/Login":
+            self.respond(handler=handler, body=PA_LOGIN_PAGE)
+
+        elif path == "/Member/Profile":
+            self.respond(handler=handler, body=PA_PROFILE_PAGE)
+
+        elif path == "/steam/login":
+            self.respond(handler=handler, body=STEAM_LOGIN_PAGE % {
+                "confirm_delay": self.confirm_delay * 1000})
+
+        elif path == "/steam/openid":
+            self.respond(handler=handler, body=STEAM_OPENID_PAGE)
+
+        elif path == "/steam/openid/complete":
+            self.respond(handler=handler, body="", status=302, headers={
+                "Location": "/Member/Profile",
+                "Set-Cookie": "session=benchmark; Path=/"})
+
+        # The coupon pages redirect to the login page without a session
+        elif not logged_in:
+            self.respond(handler=handler, body="", status=302,
+                         headers={"Location": "/Member/Login"})
+
+        elif path == "/en-US/Shop/Coupon/":
+            self.respond(handler=handler, body=COUPON_PAGE % {
+                "token": self.TOKEN, "success": self.SUBMIT_DIALOG["Success"]})
+
+        elif path == "/en-US/Shop/Coupon/Use":
+            length = int(handler.headers.get("Content-Length", 0))
+            form = parse_qs(handler.rfile.read(length).decode())
+
+            if form.get("__RequestVerificationToken") != [self.TOKEN]:
+                self.respond(handler=handler, body="Forbidden", status=403)
+                return
+
+            status = self.COUPON_STATUS.get(
+                form.get("couponCode1", [""])[0], "Invalid")
+
+            self.respond(handler=handler, body=self.SUBMIT_DIALOG[status],
+                         content_type="text/plain")
+
+        elif path == "/en-US/WebItemStorage/Complete":
+            self.respond(handler=handler, body=COMPLETE_PAGE)
+
+        else:
+            self.respond(handler=handler, body="Not Found", status=404)
@@ -0,0 +1,201 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+
+from benchmark.Server import Server
+from utils.Bot import Bot
+from utils.Requester import Requester
+from utils.Worker import Worker
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments
+
+    :returns: Namespace with the command line arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Benchmarks CouponWizard against local stand-ins of the websites")
+
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1, 10, 100, 1000],
+        help="number of coupons of each benchmarked batch (default: 1 10 100 1000)")
+
+    parser.add_argument(
+        "--latency", type=float, default=0.05, metavar="SECONDS",
+        help="latency added to every response of the stand-ins (default: 0.05)")
+
+    parser.add_argument(
+        "--confirm-delay", type=float, default=0, metavar="SECONDS",
+        help="delay before the stand-in Steam login is confirmed (default: 0)")
+
+    parser.add_argument(
+        "--http", action="store_true",
+        help="submit the coupons with plain HTTP requests after login")
+
+    parser.add_argument(
+        "--backends", nargs="+", choices=["selenium", "cdp"], default=["selenium", "cdp"],
+        help="browser backends to compare (default: selenium cdp)")
+
+    parser.add_argument(
+        "--tabs", type=int, default=1,
+        help="number of browser tabs the coupons are spread across (default: 1)")
+
+    parser.add_argument(
+        "--lean", action="store_true",
+        help="block the images, fonts, media and third-party scripts in the browser")
+
+    parser.add_argument(
+        "--output", default="benchmark_results.jsonl",
+        help="JSON lines file the results are appended to (default: benchmark_results.jsonl)")
+
+    return parser.parse_args()
+
+
+def generate_coupons(size: int) -> list:
+    """
+    Generates a batch of coupon codes, mixing the statuses of the stand-in coupon page
+
+    :param size: Number of coupon codes
+    :returns: List with the coupon codes
+    """
+
+    prefixes = ["AAAA", "BBBB", "CCCC"]
+
+    return [f"{prefixes[i % len(prefixes)]}-{i:04d}-{i // 10000:04d}-TEST"
+            for i in range(size)]
+
+
+def get_commit() -> str:
+    """
+    Returns the current git commit, to compare the results over time
+
+    :returns: Hash of the current git commit, or None outside of a git repository
+    """
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(server: Server, size: int, http: bool, bot_options: dict) -> dict:
+    """
+    Runs the pipeline of one account on a batch of coupons, timing each stage
+
+    :param server: Running stand-in server
+    :param size: Number of coupons in the batch
+    :param http: Submit the coupons with plain HTTP requests after login
+    :param bot_options: Keyword arguments passed on to the bot
+    :returns: Dictionary with the number of seconds of each stage
+    """
+
+    server.coupons = generate_coupons(size=size)
+
+    # Leave the pacing out, to time the browser and the server only
+    worker = Worker(account="benchmark", user_credentials={
+        "steam": ["benchmark", "benchmark", ""]}, http=http,
+        scheduler_options={"max_rate": None})
+
+    timings = dict()
+
+    start = time.perf_counter()
+    with Requester(sources=[{"name": "benchmark", "url": server.api,
+                             "format": "garmoth"}]) as requester:
+        coupons = requester.request_coupons()
+    timings["fetch"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with Bot(login_page=server.login_page,
+             coupon_redeem_page=server.coupon_redeem_page, **bot_options) as bot:
+        timings["cold_start"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        worker.provider_login(bot=bot)
+        timings["login"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        coupons_log = worker.redeem_coupons(
+            bot=bot, coupons=[coupon.code for coupon in coupons])
+        timings["redeem"] = time.perf_counter() - start
+
+    if len(coupons_log) != size:
+        raise Exception(f"Redeemed {len(coupons_log)}/{size} coupons.")
+
+    timings["per_coupon"] = timings["redeem"] / size
+    timings["per_account"] = sum(
+        timings[stage] for stage in ["fetch", "cold_start", "login", "redeem"])
+
+    return timings
+
+
+def main() -> None:
+    """
+    Benchmarks every batch size and appends the results to the output file
+
+    :returns: None
+    """
+
+    arguments = parse_arguments()
+    output = os.path.abspath(arguments.output)
+
+    per_coupon = dict()
+
+    with Server(latency=arguments.latency, confirm_delay=arguments.confirm_delay) as server:
+        for backend in arguments.backends:
+            bot_options = {"backend": backend, "tabs": arguments.tabs,
+                           "lean": arguments.lean}
+            options = {"http": arguments.http, "latency": arguments.latency,
+                       "confirm_delay": arguments.confirm_delay, **bot_options}
+
+            for size in arguments.sizes:
+
+                # Keep the logs and caches of the run out of the working directory
+                with tempfile.TemporaryDirectory() as directory:
+                    cwd = os.getcwd()
+                    os.chdir(directory)
+
+                    try:
+                        timings = benchmark(
+                            server=server, size=size, http=arguments.http,
+                            bot_options=bot_options)
+
+                    finally:
+                        os.chdir(cwd)
+
+                logging.info(f"[{backend}] {size} coupon(s): " + ", ".join(
+                    f"{stage} {seconds:.3f}s" for stage, seconds in timings.items()))
+
+                per_coupon.setdefault(size, dict())[backend] = timings["per_coupon"]
+
+                with open(output, "a") as file:
+                    file.write(json.dumps({
+                        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                        "commit": get_commit(),
+                        "options": options,
+                        "size": size,
+                        "timings": timings
+                    }) + "\n")
+
+    # Compare the per coupon latency of the backends
+    if len(arguments.backends) > 1:
+        for size, backends in per_coupon.items():
+            logging.info(f"{size} coupon(s) per coupon: " + ", ".join(
+                f"{backend} {seconds * 1000:.1f}ms" for backend, seconds in backends.items()))
+
+    logging.info(f"Results appended to {output}.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    main()
@@ -1,37 +1,305 @@
+import time
+
+# Measure the time spent importing the modules
+START_TIME = time.perf_counter()
+
+import argparse
+import contextlib
 import logging
 
-from utils.Bot import Bot
+from utils.Launcher import Launcher
 from utils.Library import Library
+from utils.Metrics import METRICS
+from utils.Outcomes import Outcomes
 from utils.Requester import Requester
+from utils.Tracer import TRACER
+
+IMPORT_TIME = time.perf_counter()
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments
+
+    :returns: Namespace with the command line arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Redeems the active BlackDesert coupons")
+
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="maximum number of accounts redeemed at the same time (default: 1)")
+
+    parser.add_argument(
+        "--http", action="store_true",
+        help="submit the coupons with plain HTTP requests after login, "
+        "falling back to the browser")
+
+    parser.add_argument(
+        "--backend", choices=["selenium", "cdp"], default="selenium",
+        help="browser backend, either chromedriver or the Chrome DevTools Protocol "
+        "directly (default: selenium)")
+
+    parser.add_argument(
+        "--tabs", type=int, default=1, metavar="TABS",
+        help="number of browser tabs each account spreads its coupons across, "
+        "loading the coupon page in the next tabs while submitting in one (default: 1)")
+
+    parser.add_argument(
+        "--lean", action="store_true",
+        help="block the images, fonts, media and third-party scripts in the browser")
+
+    parser.add_argument(
+        "--allow-url", action="append", default=list(), metavar="PATTERN",
+        help="blocked URL pattern to allow anyway in the lean browser, can be repeated")
+
+    parser.add_argument(
+        "--measure", action="store_true",
+        help="log the bytes transferred and the page load time of the browser")
+
+    parser.add_argument(
+        "--no-prefetch", dest="prefetch", action="store_false",
+        help="only start the browser once the new coupons are known, "
+        "instead of while they are being requested")
+
+    parser.add_argument(
+        "--max-rate", type=float, default=2, metavar="COUPONS",
+        help="maximum number of coupons redeemed per second by each account (default: 2)")
+
+    parser.add_argument(
+        "--cooldown", type=float, default=60, metavar="SECONDS",
+        help="time to wait after hitting the redeem limit before resuming, "
+        "doubled on each consecutive hit (default: 60)")
+
+    parser.add_argument(
+        "--storage", choices=["json", "jsonl", "sqlite"], default="json",
+        help="storage backend of the coupons log (default: json)")
+
+    parser.add_argument(
+        "--cache-ttl", type=float, default=0, metavar="SECONDS",
+        help="reuse the cached coupon sources responses for the given number of seconds")
+
+    parser.add_argument(
+        "--region", metavar="REGION",
+        help="only redeem the coupons of the given region, like naeu, "
+        "the coupons without region are always redeemed")
+
+    parser.add_argument(
+        "--metrics-port", type=int, metavar="PORT",
+        help="serve the stage latencies and coupon outcomes in the Prometheus format "
+        "on the given local port")
+
+    parser.add_argument(
+        "--metrics-file", metavar="FILE",
+        help="write the stage latencies and coupon outcomes in the Prometheus format "
+        "to the given file, for the node exporter textfile collector")
+
+    parser.add_argument(
+        "--timing", action="store_true",
+        help="log the import and run time of the script")
+
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="write a timeline of every stage and browser command of the run "
+        "to the given file, in the Chrome trace event format")
+
+    parser.add_argument(
+        "--profile", metavar="FILE",
+        help="profile the Python functions of the run with cProfile "
+        "and write the merged statistics of every thread to the given file")
+
+    parser.add_argument(
+        "--watch", type=float, metavar="SECONDS",
+        help="keep running and poll the coupons API every given number of seconds")
+
+    parser.add_argument(
+        "--listen", type=int, metavar="PORT",
+        help="keep running and redeem the coupons posted to a local HTTP endpoint "
+        "on the given port, as a JSON list or any text with coupon codes")
+
+    parser.add_argument(
+        "--intake", metavar="FILE",
+        help="keep running and redeem the coupons written to the given FIFO, or appended "
+        "to the given file, one or more per line, or to the standard input with -")
+
+    parser.add_argument(
+        "--batch-window", type=float, default=1, metavar="SECONDS",
+        help="time without a new pushed coupon before a burst is redeemed "
+        "in the same session (default: 1)")
+
+    parser.add_argument(
+        "--recycle-after", type=int, metavar="COUPONS",
+        help="when running continuously, recycle the browser of an account "
+        "after it submitted the given number of coupons")
+
+    parser.add_argument(
+        "--max-browser-age", type=float, metavar="SECONDS",
+        help="when running continuously, recycle the browser of an account "
+        "once it is older than the given number of seconds")
+
+    parser.add_argument(
+        "--max-browser-memory", type=float, metavar="MB",
+        help="when running continuously, recycle the browser of an account "
+        "once it uses more than the given resident memory")
+
+    parser.add_argument(
+        "--host-memory", type=float, metavar="MB",
+        help="when running continuously, do not start a new browser while every browser "
+        "together uses more than the given resident memory")
+
+    parser.add_argument(
+        "--queue", choices=["coordinator", "worker"],
+        help="share the accounts between several hosts through a job queue, either "
+        "queue the new coupons of every account, or redeem the queued ones")
+
+    parser.add_argument(
+        "--queue-file", default="queue.db", metavar="FILE",
+        help="SQLite file of the job queue, shared by every host (default: queue.db)")
+
+    parser.add_argument(
+        "--lease", type=float, default=600, metavar="SECONDS",
+        help="time after which the jobs of a worker that stopped responding "
+        "are handed out again (default: 600)")
+
+    return parser.parse_args()
+
+
+def new_coupons(account: str, region: str, coupons: list, storage: str,
+                outcomes: Outcomes) -> list:
+    """
+    Filters out the coupons already in the log of an account region
+
+    :param account: Name of the account
+    :param region: Region of the account log
+    :param coupons: List with the active coupons
+    :param storage: Name of the coupons log storage backend
+    :param outcomes: Cache of the coupon outcomes shared by every account
+    :returns: List with the coupons not in the account region log yet
+    """
 
+    with Library(account=account, storage=storage, outcomes=outcomes,
+                 region=region) as library:
+        return library.filter_coupons(coupons=coupons)
 
-def main() -> None:
+
+def main(workers: int = 1, http: bool = False, storage: str = "json",
+         cache_ttl: float = 0, watch: float = None, prefetch: bool = True,
+         region: str = None, bot_options: dict = None,
+         scheduler_options: dict = None, metrics_file: str = None,
+         queue: str = None, queue_file: str = "queue.db", lease: float = 600,
+         listen: int = None, intake: str = None, batch_window: float = 1,
+         lifecycle_options: dict = None) -> None:
     """
     Main function to execute the script
 
+    :param workers: Maximum number of accounts redeemed at the same time
+    :param http: Submit the coupons with plain HTTP requests after login
+    :param storage: Name of the coupons log storage backend
+    :param cache_ttl: Number of seconds the cached coupon sources responses are reused
+    :param watch: Number of seconds between polls of the coupons API,
+    to keep running instead of redeeming once
+    :param prefetch: Start the browsers while the coupons are still being requested
+    :param region: Region of the coupons to redeem, any region if not provided
+    :param bot_options: Keyword arguments passed on to every bot
+    :param scheduler_options: Keyword arguments passed on to every redeem scheduler
+    :param metrics_file: Name of the file the metrics are written to
+    :param queue: Role of the host in the job queue, either "coordinator" to queue
+    the new coupons of every account, or "worker" to redeem the queued ones
+    :param queue_file: Name of the SQLite file of the job queue
+    :param lease: Number of seconds the jobs of an account stay leased to a worker
+    without renewal
+    :param listen: Port of the local HTTP endpoint the coupons are pushed to
+    :param intake: Name of the file or FIFO the coupons are pushed to, "-" for the
+    standard input
+    :param batch_window: Number of seconds without a new pushed coupon
+    before a burst is redeemed
+    :param lifecycle_options: Keyword arguments passed on to the manager of the browsers
+    kept between runs, when running continuously
     :returns: None
     """
 
-    with Requester() as requester:
-        with Library() as library:
+    # Leave the journals to the libraries of the selected storage
+    with Library(journal=False) as library:
+
+        try:
+            # Retrieve the credentials of every account from the JSON file
+            accounts = library.get_accounts()
+
+        # if the credentials were not provided,
+        # end the script
+        except Exception as e:
+            logging.error(f"Failed to retrieve user credentials. {e}")
+            return
+
+    # Redeem the jobs queued by the coordinator,
+    # on the accounts this host has credentials for
+    if queue == "worker":
+        # Only import the browser modules once they are needed
+        from utils.Consumer import Consumer
+        from utils.JobQueue import JobQueue
+        from utils.Lifecycle import Lifecycle
 
+        # The browsers are kept between the leases of their account
+        with JobQueue(queue_file=queue_file, lease=lease) as job_queue, \
+                Outcomes() as outcomes, \
+                Lifecycle(**lifecycle_options or dict()) as lifecycle, \
+                Consumer(queue=job_queue, accounts=accounts, workers=workers, http=http,
+                         storage=storage, bot_options=bot_options, outcomes=outcomes,
+                         scheduler_options=scheduler_options,
+                         lifecycle=lifecycle) as consumer:
+            results = consumer.run()
+
+            # print the ratio of coupons redeemed per account
+            consumer.report(results=results)
+
+            logging.info(f"Queued jobs: {job_queue.get_stats()}")
+
+        return
+
+    # Keep polling the API, or receiving pushed coupons, until interrupted
+    if watch or listen is not None or intake:
+        # Only import the browser modules once they are needed
+        from utils.Intake import Intake
+        from utils.Lifecycle import Lifecycle
+        from utils.Watcher import Watcher
+
+        if watch:
+            logging.info(f"Watching for new coupons every {watch} seconds...")
+
+        if listen is not None:
+            logging.info(f"Listening for pushed coupons on port {listen}...")
+
+        with (Intake(port=listen, stream=intake, region=region, batch_window=batch_window)
+              if listen is not None or intake else contextlib.nullcontext()) as coupon_intake, \
+                Lifecycle(**lifecycle_options or dict()) as lifecycle, \
+                Watcher(accounts=accounts, interval=watch, workers=workers,
+                        storage=storage, prefetch=prefetch, region=region,
+                        metrics_file=metrics_file, intake=coupon_intake, http=http,
+                        bot_options=bot_options, scheduler_options=scheduler_options,
+                        lifecycle=lifecycle) as watcher:
             try:
-                # Retrieve the user credentials from the JSON file
-                user_credentials = library.get_user_credentials()
+                watcher.run()
 
-            # if the credentials were not provided,
-            # end the script
-            except Exception as e:
-                logging.error(f"Failed to retrieve user credentials. {e}")
-                return
+            except KeyboardInterrupt:
+                logging.info("Stopped watching for new coupons.")
 
+        return
+
+    # Browsers started in the background are closed on exit if no account used them,
+    # and the coupons found invalid are shared between the accounts
+    with Launcher(count=min(workers, len(accounts)), bot_options=bot_options) as launcher, \
+            Outcomes() as outcomes:
+
+        with Requester(cache_ttl=cache_ttl, region=region) as requester:
             logging.info("Requesting coupons from API...")
 
             try:
-                # Retrieve the current active coupons from the API
-                # and filter out the coupons that have already been redeemed
-                new_coupons = library.filter_coupons(
-                    coupons=requester.request_coupons())
+                # Retrieve the current active coupons from the API,
+                # starting the browsers as soon as any source changed,
+                # unless the coupons are left to the job queue workers
+                coupons = requester.request_coupons(
+                    on_change=launcher.start if prefetch and not queue else None)
 
             # If the request failed,
             # end the script
@@ -39,65 +307,108 @@ def main() -> None:
                 logging.error(f"Failed to retrieve coupons. \n{e}")
                 return
 
-            # If there are no new coupons,
-            # end the script
-            if not new_coupons:
-                logging.info("No new coupons available.")
-                return
+        # Keep the accounts that have not redeemed every active coupon
+        # on all of their regions yet
+        pending = dict()
 
-            logging.info(f"Found {len(new_coupons)} new coupon(s) to redeem.")
+        with TRACER.span(name="pending"):
+            for account, user_credentials in list(accounts.items()):
+                for account_region in user_credentials.get("regions") or [Library.DEFAULT_REGION]:
+                    region_coupons = new_coupons(
+                        account=account, region=account_region, coupons=coupons,
+                        storage=storage, outcomes=outcomes)
 
-    with Bot() as bot:
+                    if region_coupons:
+                        pending.setdefault(account, dict())[account_region] = region_coupons
 
-        try:
-            # Login in to Steam account using the provided username and password
-            if user_credentials["steam"]:
-                logging.info("Logging in to Steam account...")
-                bot.steam_account_login(*user_credentials["steam"])
-
-            # Login in to Pearl Abyss account using the provided email and password
-            elif user_credentials["pearl_abyss"]:
-                logging.info("Logging in to Pearl Abyss account...")
-                # TODO: Add support for PA account login
-                bot.pa_account_login(*user_credentials["pearl_abyss"])
-
-        # If the login attempt failed,
-        # end the script
-        except Exception as e:
-            logging.error(f"Login failed. {e}")
+                if account not in pending:
+                    del accounts[account]
+
+        # If there are no new coupons,
+        # end the script before importing the browser modules
+        if not accounts:
+            logging.info("No new coupons available.")
             return
 
-        # If the login was successful,
-        # redeem the coupons
-        logging.info("Redeeming coupons...")
+        # Leave the new coupons to the workers of the job queue
+        if queue == "coordinator":
+            from utils.JobQueue import JobQueue
 
-        coupons_log = dict()
+            with JobQueue(queue_file=queue_file, lease=lease) as job_queue:
+                count = sum(
+                    job_queue.add_jobs(account=account, region=account_region,
+                                       coupons=[coupon.code for coupon in region_coupons])
+                    for account, regions in pending.items()
+                    for account_region, region_coupons in regions.items())
 
-        try:
-            # Attempt to redeem the coupons and add them to the log
-            for coupon in new_coupons:
-                coupons_log.update(bot.redeem_coupon(coupon=coupon))
+                logging.info(f"Queued {count} new job(s). Queued jobs: {job_queue.get_stats()}")
 
-        # If the attempt failed,
-        # end the script
-        except Exception as e:
-            logging.error(f"Redeeming process failed. {e}")
             return
 
-        # print the ratio of coupons redeemed
-        success_count = list(coupons_log.values()).count("Success")
-        logging.info(
-            f"Successfully redeemed {success_count}/{len(new_coupons)} coupons.")
+        # Only import the browser modules once there is something to redeem
+        from utils.Pool import Pool
 
-        with Library() as library:
+        # Each account filters out the coupons it has already redeemed
+        # and only takes a browser if there is something left to redeem
+        with Pool(workers=workers, http=http, storage=storage,
+                  bot_options=bot_options, outcomes=outcomes,
+                  scheduler_options=scheduler_options) as pool:
+            with TRACER.span(name="pool", accounts=len(accounts)):
+                results = pool.run(
+                    accounts=accounts, coupons=coupons, launcher=launcher)
 
-            # Add the coupons to the log file
-            library.add_coupons(coupons=coupons_log)
+            # print the ratio of coupons redeemed per account
+            pool.report(results=results)
 
-        logging.info("Check log file for details.")
+    logging.info("Check log file for details.")
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
 
-    main()
+    arguments = parse_arguments()
+
+    if arguments.metrics_port:
+        METRICS.serve(port=arguments.metrics_port)
+
+    # Only record the timeline when asked to,
+    # every span is a no-op otherwise
+    if arguments.trace or arguments.profile:
+        TRACER.start(profile=bool(arguments.profile))
+
+    try:
+        with TRACER.span(name="main"), TRACER.profile():
+            main(workers=arguments.workers, http=arguments.http,
+                 storage=arguments.storage, cache_ttl=arguments.cache_ttl,
+                 watch=arguments.watch, prefetch=arguments.prefetch, region=arguments.region,
+                 bot_options={"backend": arguments.backend,
+                              "tabs": arguments.tabs,
+                              "lean": arguments.lean,
+                              "allowed_urls": arguments.allow_url,
+                              "measure": arguments.measure},
+                 scheduler_options={"max_rate": arguments.max_rate,
+                                    "cooldown": arguments.cooldown},
+                 metrics_file=arguments.metrics_file, queue=arguments.queue,
+                 queue_file=arguments.queue_file, lease=arguments.lease,
+                 listen=arguments.listen, intake=arguments.intake,
+                 batch_window=arguments.batch_window,
+                 lifecycle_options={"max_coupons": arguments.recycle_after,
+                                    "max_age": arguments.max_browser_age,
+                                    "max_memory": arguments.max_browser_memory,
+                                    "host_memory": arguments.host_memory})
+
+    finally:
+        # Keep the metrics of the run, even if it failed
+        if arguments.metrics_file:
+            METRICS.write_file(file_name=arguments.metrics_file)
+
+        if arguments.trace:
+            TRACER.write_file(file_name=arguments.trace)
+
+        if arguments.profile:
+            TRACER.write_profile(file_name=arguments.profile)
+
+    if arguments.timing:
+        logging.info(
+            f"Imports took {(IMPORT_TIME - START_TIME) * 1000:.1f}ms, "
+            f"run took {(time.perf_counter() - START_TIME) * 1000:.1f}ms.")
@@ -22,9 +22,12 @@ def setup() -> None:
         password = input("Password: ")
         pp_pin = input(
             "Parental protection pin: ")
+        shared_secret = input(
+            "Steam Guard shared secret: ")
 
         save_credentials(
-            {"steam": {"username": username, "password": password, "pp_pin": pp_pin}})
+            {"steam": {"username": username, "password": password, "pp_pin": pp_pin,
+                       "shared_secret": shared_secret}})
 
     def setup_pearl_abyss() -> None:
         """
@@ -48,7 +51,7 @@ def setup() -> None:
         :returns: None
         """
 
-        with Library() as library:
+        with Library(journal=False) as library:
             library.save_user_credentials(user_credentials=user_credentials)
 
     while True:
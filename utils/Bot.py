@@ -1,10 +1,11 @@
 import logging
+import time
 
-from selenium import webdriver
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions
-from selenium.webdriver.support.ui import WebDriverWait
+from utils.Coupon import Coupon
+from utils.Driver import DRIVERS
+from utils.Metrics import METRICS
+from utils.Scheduler import RateLimitError
+from utils.SteamGuard import SteamGuard
 
 
 class Bot:
@@ -13,36 +14,182 @@ class Bot:
     LOGIN_PAGE = "https://account.pearlabyss.com/Member/Login"
     COUPON_REDEEM_PAGE = "https://payment.naeu.playblackdesert.com/en-US/Shop/Coupon/"
 
-    def __init__(self):
-        """ Initializes webdriver options and create a webdriver instance """
+    COUPON_REDEEM_PAGES = Coupon.COUPON_REDEEM_PAGES
+
+    # Number of seconds a Steam Guard code must stay valid to be submitted
+    STEAM_GUARD_MARGIN = 2
+
+    REDEEM_SELECTORS = {
+        "pa_navbar": ".bg_top_newtwork",
+        "coupon_form": ".custom_input input",
+        "submit_button": "#submitCoupon",
+        "login_button": ".btn_steam_login",
+    }
+
+    SUBMIT_DIALOG = {
+        "Success": "You have successfully redeemed the coupon code.",
+        "Already Redeemed": "This coupon code cannot be used multiple times.",
+        "Invalid": "You cannot use this coupon code."
+    }
+
+    # Resources that are not needed by the login and coupon flows
+    BLOCKED_URLS = [
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+        "*.mp4", "*.webm", "*.mp3",
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*googlesyndication.com*", "*facebook.net*", "*facebook.com/tr*",
+        "*hotjar.com*", "*clarity.ms*", "*criteo.com*", "*adnxs.com*"
+    ]
+
+    def __init__(self, lean: bool = False, allowed_urls: list = None, measure: bool = False,
+                 login_page: str = None, coupon_redeem_page: str = None,
+                 backend: str = "selenium", tabs: int = 1):
+        """
+        Starts the browser with the selected backend
+
+        :param lean: Block the images, fonts, media and third-party scripts
+        :param allowed_urls: List with the blocked URL patterns to allow anyway
+        :param measure: Measure the bytes transferred and the load time of every page
+        :param login_page: URL of the login page, to use instead of the Pearl Abyss one
+        :param coupon_redeem_page: URL of the coupon redeem page,
+        to use instead of the BlackDesert one
+        :param backend: Name of the browser backend, either "selenium" or "cdp"
+        :param tabs: Number of tabs the coupons are spread across, sharing the same session
+        """
+
+        if backend not in DRIVERS:
+            raise Exception(f"Unknown browser backend {backend}.")
+
+        if tabs < 1:
+            raise Exception("The number of tabs must be at least 1.")
+
+        if login_page:
+            self.LOGIN_PAGE = login_page
+
+        if coupon_redeem_page:
+            self.COUPON_REDEEM_PAGE = coupon_redeem_page
+            self.COUPON_REDEEM_PAGES = {"naeu": coupon_redeem_page}
+
+        # Record the network events to measure the transferred bytes
+        self.measure = measure
 
-        self.webdriver_options = webdriver.ChromeOptions()
-        # Run selenium in headless mode
-        self.webdriver_options.add_argument(argument="--headless")
-        # Hide console logs
-        self.webdriver_options.add_experimental_option(
-            name="excludeSwitches", value=["enable-logging"])
-        self.webdriver = webdriver.Chrome(options=self.webdriver_options)
+        with METRICS.time(stage="chrome_startup"):
+            self.driver = DRIVERS[backend](measure=measure)
 
-        # Set webdriver wait times
-        self.short_wait = WebDriverWait(driver=self.webdriver, timeout=5)
-        self.wait = WebDriverWait(driver=self.webdriver, timeout=15)
+        # Put every browser command on the timeline of the run, if tracing
+        self.driver.trace()
 
-        self.webdriver.get(url=self.LOGIN_PAGE)
+        # Set the wait times, in seconds
+        self.short_wait = 5
+        self.wait = 15
+
+        # Block the unneeded resources before loading any page
+        self.blocked_urls = [url for url in self.BLOCKED_URLS
+                             if url not in (allowed_urls or list())] if lean else None
+        self.block_urls()
+
+        # The other tabs are only opened once the coupons are redeemed
+        self.tab_count = tabs
+        self.tabs = [self.driver.current_tab]
+
+        self.page_stats = {"pages": 0, "bytes": 0,
+                           "blocked": 0, "load_time": 0}
+
+        # Tell when the browser is due to be recycled
+        self.start_time = time.monotonic()
+        self.coupon_count = 0
+
+        self.driver.get(url=self.LOGIN_PAGE)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.webdriver.quit()
+        if self.measure and self.page_stats["pages"]:
+            logging.info(
+                f"Loaded {self.page_stats['pages']} page(s), "
+                f"{self.page_stats['bytes'] / 1024:.0f} KB transferred, "
+                f"{self.page_stats['blocked']} request(s) blocked, "
+                f"{self.page_stats['load_time']:.2f}s total load time.")
+
+        self.driver.quit()
 
-    def steam_account_login(self, username: str, password: str, pp_pin: str) -> None:
+    def block_urls(self) -> None:
+        """
+        Blocks the unneeded resources in the current tab, if the lean mode is enabled
+
+        :return: None
+        """
+
+        if not self.blocked_urls:
+            return
+
+        self.driver.execute_cdp_cmd(
+            cmd="Network.enable", cmd_args={})
+        self.driver.execute_cdp_cmd(
+            cmd="Network.setBlockedURLs", cmd_args={"urls": self.blocked_urls})
+
+    def open_tabs(self) -> list:
+        """
+        Opens the tabs that are not open yet, each blocking the unneeded resources
+        on its own, and switches back to the first tab
+
+        :return: List with the handles of every tab
+        """
+
+        while len(self.tabs) < self.tab_count:
+            self.tabs.append(self.driver.open_tab())
+            self.block_urls()
+
+        self.driver.switch_tab(tab=self.tabs[0])
+
+        return self.tabs
+
+    def measure_page(self) -> dict:
+        """
+        Measures the bytes transferred since the last measure
+        and the load time of the current page, if measuring is enabled
+
+        :return: A dictionary with the bytes transferred, requests blocked
+        and load time in seconds, or None if measuring is disabled
+        """
+
+        if not self.measure:
+            return None
+
+        page_stats = {"bytes": 0, "blocked": 0}
+
+        # Sum the bytes of every finished request,
+        # and count the requests that were blocked
+        for method, params in self.driver.get_network_events():
+            if method == "Network.loadingFinished":
+                page_stats["bytes"] += params["encodedDataLength"]
+
+            elif method == "Network.loadingFailed" and params.get("blockedReason"):
+                page_stats["blocked"] += 1
+
+        page_stats["load_time"] = self.driver.execute_script("""
+            const navigation = performance.getEntriesByType("navigation")[0];
+            return navigation ? Math.max(navigation.loadEventEnd, navigation.domContentLoadedEventEnd) / 1000 : 0;
+        """)
+
+        self.page_stats["pages"] += 1
+        for stat, value in page_stats.items():
+            self.page_stats[stat] += value
+
+        return page_stats
+
+    def steam_account_login(self, username: str, password: str, pp_pin: str,
+                            shared_secret: str = None) -> None:
         """
         Login to Steam account using provided username, password
 
         :param username: Steam account username
         :param password: Steam account password
         :param pp_pin: Steam parental protection pin (optional)
+        :param shared_secret: Steam Guard shared secret, to enter the authentication code
+        instead of waiting for the confirmation on the phone (optional)
         :return: None
         """
 
@@ -63,138 +210,295 @@ class Bot:
             "error": ".newlogindialog_Danger_1-HwJ"
         }
 
-        try:
-            # Wait for the login page to load
-            self.wait.until(
-                method=expected_conditions.presence_of_all_elements_located(
-                    locator=(By.CSS_SELECTOR, STEAM_SELECTORS["pa_navbar"])))
+        # Time each step, to spot the ones slowed down by a changed selector
+        with METRICS.steps(prefix="login") as steps:
+            steps.start(step="page")
 
-            # Click the steam login button
-            steam_button = self.webdriver.find_element(
-                By.CSS_SELECTOR, STEAM_SELECTORS["steam_button"])
+            try:
+                # Wait for the login page to load
+                self.driver.wait_for_element(
+                    selector=STEAM_SELECTORS["pa_navbar"], timeout=self.wait)
 
-            # Javascript click to avoid element not interactable exception
-            self.webdriver.execute_script(
-                "arguments[0].click();", steam_button)
+                # Click the steam login button,
+                # with Javascript to avoid element not interactable exception
+                self.driver.click(
+                    selector=STEAM_SELECTORS["steam_button"], script=True)
 
-        # If the steam login page is unreachable,
-        # raise an exception
-        except TimeoutException:
-            raise Exception("Steam login page unreachable.")
+            # If the steam login page is unreachable,
+            # raise an exception
+            except TimeoutError:
+                raise Exception("Steam login page unreachable.")
 
-        try:
-            # Wait for the login form to load
-            login_form = self.wait.until(
-                method=expected_conditions.presence_of_all_elements_located(
-                    locator=(By.CSS_SELECTOR, STEAM_SELECTORS["login_form"])))
+            steps.start(step="form")
 
-        # If the steam login form is not found,
-        # raise an exception
-        except TimeoutException:
-            raise Exception("Steam login form not found.")
+            try:
+                # Wait for the login form to load
+                self.driver.wait_for_element(
+                    selector=STEAM_SELECTORS["login_form"], timeout=self.wait)
 
-        # Fill in the login form with the provided username and password
-        for login_input, login_data in zip(login_form, [username, password]):
-            login_input.send_keys(login_data)
+            # If the steam login form is not found,
+            # raise an exception
+            except TimeoutError:
+                raise Exception("Steam login form not found.")
 
-        # Click the login button
-        self.webdriver.find_element(
-            By.CSS_SELECTOR, STEAM_SELECTORS["login_submit_button"]).click()
+            # Fill in the login form with the provided username and password
+            self.driver.fill(
+                selector=STEAM_SELECTORS["login_form"], values=[username, password])
+
+            steps.start(step="submit")
+
+            # Click the login button
+            self.driver.click(selector=STEAM_SELECTORS["login_submit_button"])
 
-        try:
-            # Wait for the authentication page to load
-            self.short_wait.until(
-                method=expected_conditions.presence_of_all_elements_located(
-                    locator=(By.CSS_SELECTOR, STEAM_SELECTORS["auth_page"])))
-
-        # If the authentication page is not found,
-        # check for error message or login timeout
-        except TimeoutException:
             try:
-                # Wait for an error message to appear
-                self.short_wait.until(
-                    method=expected_conditions.presence_of_all_elements_located(
-                        locator=(By.CSS_SELECTOR, STEAM_SELECTORS["error"])))
+                # Wait for the authentication page, an error message or the login timeout,
+                # whichever appears first
+                outcome = self.driver.wait_for_any(selectors={
+                    name: STEAM_SELECTORS[name]
+                    for name in ["auth_page", "error", "login_timeout"]}, timeout=self.wait)
 
-                # If an error message is found,
-                # raise an exception
+            # If none of them appears,
+            # raise an exception
+            except TimeoutError:
+                raise Exception("Authentication page unreachable.")
+
+            # If an error message is found,
+            # raise an exception
+            if outcome == "error":
                 raise Exception("Invalid username or password.")
 
-            # If no error message is found,
-            # check for login timeout
-            except TimeoutException:
+            # If login timeout is found,
+            # raise an exception
+            if outcome == "login_timeout":
+                raise Exception("Exceeded maximum login attempts.")
+
+            steps.start(step="confirmation")
+
+            # If the Steam Guard shared secret is provided,
+            # enter the authentication code instead of waiting for the confirmation
+            if shared_secret:
+                self.enter_steam_guard_code(
+                    shared_secret=shared_secret, selectors=STEAM_SELECTORS)
+
+            else:
                 try:
-                    # Check for login timeout
-                    self.short_wait.until(
-                        method=expected_conditions.presence_of_element_located(
-                            locator=(By.CSS_SELECTOR, STEAM_SELECTORS["login_timeout"])))
+                    logging.info(
+                        "Authentication required. Awaiting confirmation...")
+
+                    # Wait for the authentication to be accepted
+                    self.driver.wait_for_element(
+                        selector=STEAM_SELECTORS["auth_done"], timeout=self.wait)
+
+                    logging.info("Login successfully. Authentication accepted.")
 
-                    # If login timeout is found,
-                    # raise an exception
-                    raise Exception("Exceeded maximum login attempts.")
+                # If the authentication is not accepted,
+                # raise an exception
+                except TimeoutError:
+                    raise Exception("Authentication timeout.")
+
+            steps.start(step="parental_protection")
+
+            try:
+                # Wait for either the parental protection form or the sign in button,
+                # so that accounts without parental protection do not wait for the form
+                outcome = self.driver.wait_for_any(selectors={
+                    name: STEAM_SELECTORS[name]
+                    for name in ["pp_input", "signin_button"]}, timeout=self.wait)
 
-                # If either error message or login timeout is not found,
+            # If neither appears,
+            # raise an exception
+            except TimeoutError:
+                raise Exception("Steam sign in page unreachable.")
+
+            if outcome == "pp_input":
+                # If no parental protection pin is provided,
                 # raise an exception
-                except TimeoutException:
-                    raise Exception("Authentication page unreachable.")
+                if not pp_pin:
+                    raise Exception("Parental protection pin not provided.")
+
+                # Fill in the parental protection pin
+                self.driver.fill(
+                    selector=STEAM_SELECTORS["pp_input"], values=[pp_pin])
+
+                # Check for incorrect pin message
+                pp_error = self.driver.get_text(
+                    selector=STEAM_SELECTORS["pp_error"])
+
+                # If the parental protection pin is incorrect,
+                # raise an exception
+                if len(pp_error) > 0:
+                    raise Exception("Parental protection pin incorrect.")
+
+                # Click the submit button
+                self.driver.click(selector=STEAM_SELECTORS["pp_submit_button"])
+
+            steps.start(step="signin")
+
+            # Click the sign in button
+            self.driver.wait_for_element(
+                selector=STEAM_SELECTORS["signin_button"], timeout=self.wait)
+            self.driver.click(selector=STEAM_SELECTORS["signin_button"])
+
+            # Wait for the profile page to load
+            self.driver.wait_for_element(
+                selector=STEAM_SELECTORS["pa_navbar"], timeout=self.wait)
+
+        self.measure_page()
+
+    def enter_steam_guard_code(self, shared_secret: str, selectors: dict) -> None:
+        """
+        Enters the Steam Guard code generated from the shared secret
+        on the authentication page
+
+        :param shared_secret: Steam Guard shared secret of the account
+        :param selectors: Dictionary with the selectors of the Steam login pages
+        :return: None
+        """
 
         try:
-            logging.info(
-                "Authentication required. Awaiting confirmation...")
+            # Switch from the confirmation on the phone to the code entry,
+            # with Javascript to avoid element not interactable exception
+            self.driver.click(selector=selectors["auth_code_button"], script=True)
+
+            # Wait for the authentication code form to load
+            self.driver.wait_for_element(
+                selector=selectors["auth_form"], timeout=self.short_wait)
+
+        # If the code entry is unreachable,
+        # raise an exception
+        except TimeoutError:
+            raise Exception("Steam Guard code form not found.")
 
-            # Wait for the authentication to be accepted
-            self.wait.until(
-                method=expected_conditions.presence_of_element_located(
-                    locator=(By.CSS_SELECTOR, STEAM_SELECTORS["auth_done"])))
+        steam_guard = SteamGuard(shared_secret=shared_secret)
 
-            logging.info("Login successfully. Authentication accepted.")
+        # If the current code is about to expire,
+        # wait for the next one so that it is still valid once submitted
+        seconds_left = steam_guard.seconds_left()
 
-        # If the authentication is not accepted,
+        if seconds_left < self.STEAM_GUARD_MARGIN:
+            time.sleep(seconds_left)
+
+        # Each character of the code has its own input,
+        # the form submits itself once the last one is filled
+        self.driver.fill(
+            selector=selectors["auth_form"], values=list(steam_guard.generate_code()))
+
+        try:
+            # Wait for the code to be accepted, or rejected
+            outcome = self.driver.wait_for_any(selectors={
+                name: selectors[name] for name in ["auth_done", "error"]}, timeout=self.wait)
+
+        # If the code is neither accepted nor rejected,
         # raise an exception
-        except TimeoutException:
+        except TimeoutError:
             raise Exception("Authentication timeout.")
 
-        try:
-            # Wait for the parental protection form to load
-            pp_input = self.short_wait.until(
-                method=expected_conditions.presence_of_element_located(
-                    locator=(By.CSS_SELECTOR, STEAM_SELECTORS["pp_input"])))
+        # If the code was rejected, like with a wrong secret or clock,
+        # raise an exception
+        if outcome == "error":
+            raise Exception("Steam Guard code rejected.")
 
-            # If no parental protection pin is provided,
-            # raise an exception
-            if not pp_pin:
-                raise Exception("Parental protection pin not provided.")
+        logging.info("Login successfully. Steam Guard code accepted.")
+
+    def get_cookies(self) -> list:
+        """
+        Returns the cookies of every domain visited by the browser
 
-            # Fill in the parental protection pin
-            pp_input.send_keys(pp_pin)
+        :return: List with the browser cookies
+        """
 
-            # Check for incorrect pin message
-            pp_error = self.webdriver.find_element(
-                By.CSS_SELECTOR, STEAM_SELECTORS["pp_error"])
+        return self.driver.execute_cdp_cmd(
+            cmd="Network.getAllCookies", cmd_args={})["cookies"]
 
-            # If the parental protection pin is incorrect,
-            # raise an exception
-            if len(pp_error.text) > 0:
-                raise Exception("Parental protection pin incorrect.")
+    def get_coupon_redeem_page(self, region: str = None) -> str:
+        """
+        Returns the coupon redeem page of the given region
+
+        :param region: Region of the coupon redeem page, the default page if not provided
+        :return: URL of the coupon redeem page
+        """
+
+        if not region:
+            return self.COUPON_REDEEM_PAGE
+
+        # If the region has no known coupon redeem page,
+        # raise an exception
+        if region not in self.COUPON_REDEEM_PAGES:
+            raise Exception(f"Unknown region {region}.")
+
+        return self.COUPON_REDEEM_PAGES[region]
+
+    def restore_session(self, cookies: list, region: str = None) -> bool:
+        """
+        Restores the given cookies and checks if the session is still logged in
+
+        :param cookies: List with the browser cookies of a previous session
+        :param region: Region of the coupon redeem page used to check the session
+        :return: True if the coupon redeem page is reachable with the restored session
+        """
 
-            # Click the submit button
-            self.webdriver.find_element(
-                By.CSS_SELECTOR, STEAM_SELECTORS["pp_submit_button"]).click()
+        COOKIE_FIELDS = ["name", "value", "domain", "path", "secure",
+                         "httpOnly", "sameSite", "expires", "priority"]
 
-        # If the parental protection form is unreachable,
-        # assume that parental protection is not enabled
-        except TimeoutException:
+        # Remove the read-only cookie fields, and the expiry date of the
+        # session cookies, which the browser does not accept back
+        cookies = [
+            {field: cookie[field] for field in COOKIE_FIELDS
+             if field in cookie and not (field == "expires" and cookie.get("session"))}
+            for cookie in cookies]
+
+        # Set the cookies of every domain at once,
+        # without having to navigate to each domain first
+        self.driver.execute_cdp_cmd(
+            cmd="Network.setCookies", cmd_args={"cookies": cookies})
+
+        try:
+            with METRICS.time(stage="session_restore"):
+                self.driver.get(url=self.get_coupon_redeem_page(region=region))
+
+                # If the session expired,
+                # the coupon redeem page redirects to the login page
+                return self.wait_page_outcome(timeout=self.short_wait) == "coupon_form"
+
+        except TimeoutError:
             pass
 
-        # Click the sign in button
-        self.short_wait.until(
-            method=expected_conditions.presence_of_element_located(
-                locator=(By.CSS_SELECTOR, STEAM_SELECTORS["signin_button"]))).click()
+        # Return to the login page for a full login
+        self.driver.delete_all_cookies()
+        self.driver.get(url=self.LOGIN_PAGE)
+
+        return False
+
+    def get_coupon_form(self, region: str = None) -> dict:
+        """
+        Loads the coupon redeem page and reads the structure of the coupon form
+
+        :param region: Region of the coupon redeem page
+        :return: A dictionary with the form action, method, hidden fields, including
+        the anti-forgery token, and the names of the coupon code inputs,
+        or None if the coupon is not submitted through a form
+        """
+
+        self.load_coupon_page(region=region)
+
+        return self.driver.execute_script("""
+            const button = document.querySelector(arguments[0]);
+            const form = button ? button.closest("form") : null;
+
+            if (!form || !form.getAttribute("action")) {
+                return null;
+            }
 
-        # Wait for the profile page to load
-        self.wait.until(
-            method=expected_conditions.presence_of_all_elements_located(
-                locator=(By.CSS_SELECTOR, STEAM_SELECTORS["pa_navbar"])))
+            return {
+                action: form.action,
+                method: (form.getAttribute("method") || "post").toUpperCase(),
+                fields: Object.fromEntries(
+                    Array.from(form.querySelectorAll("input[type=hidden]"))
+                        .map(input => [input.name, input.value])),
+                inputs: Array.from(document.querySelectorAll(arguments[1]))
+                    .map(input => input.name)
+            };
+        """, self.REDEEM_SELECTORS["submit_button"], self.REDEEM_SELECTORS["coupon_form"])
 
     def pa_account_login(self, email: str, password: str) -> None:
         """ 
@@ -207,19 +511,70 @@ class Bot:
 
         pass
 
-    def redeem_coupon(self, coupon: str) -> dict:
+    def load_coupon_page(self, region: str = None) -> None:
         """
-        Redeem a coupon code and returns a dictionary with the coupon code and status
+        Navigates to the coupon redeem page and waits for it to load
 
-        :param coupon: The coupon code to redeem
-        :return: A dictionary with the coupon code and its status
+        :param region: Region of the coupon redeem page
+        :return: None
         """
 
-        REDEEM_SELECTORS = {
-            "pa_navbar": ".bg_top_newtwork",
-            "coupon_form": ".custom_input input",
-            "submit_button": "#submitCoupon",
-        }
+        with METRICS.time(stage="page_load"):
+            # Navigate to the coupon redeem page
+            self.driver.get(url=self.get_coupon_redeem_page(region=region))
+
+            self.wait_coupon_page()
+
+    def wait_coupon_page(self) -> None:
+        """
+        Waits for the coupon redeem page of the current tab to load
+
+        :return: None
+        """
+
+        try:
+            # Wait for the coupon form, or the login page the coupon redeem page
+            # redirects to once the session expired
+            outcome = self.wait_page_outcome(timeout=self.wait)
+
+        # If the coupon redeem page is unreachable,
+        # raise an exception
+        except TimeoutError:
+            raise Exception("Coupon redeem page unreachable.")
+
+        # If the session expired,
+        # raise an exception right away
+        if outcome == "login":
+            raise Exception("Session expired, coupon redeem page redirected to login.")
+
+        self.measure_page()
+
+    def wait_page_outcome(self, timeout: float) -> str:
+        """
+        Waits for the coupon redeem page to load, or for the login page that replaces it
+        once the session expired, whichever appears first
+
+        :param timeout: Number of seconds to wait
+        :return: Either "coupon_form" or "login"
+        """
+
+        outcome = self.driver.wait_for_any(selectors={
+            "coupon_form": self.REDEEM_SELECTORS["coupon_form"],
+            "login": self.REDEEM_SELECTORS["login_button"]}, timeout=timeout)
+
+        # Only trust the coupon form on the coupon redeem page itself
+        if "Shop/Coupon" not in self.driver.current_url:
+            return "login"
+
+        return outcome
+
+    def submit_coupon(self, coupon: str) -> str:
+        """
+        Fills in and submits a coupon code on the loaded coupon redeem page
+
+        :param coupon: The coupon code to submit
+        :return: The status of the coupon submitted
+        """
 
         def redeem_alert_handler() -> str:
             """
@@ -227,77 +582,169 @@ class Bot:
 
             :return: The status of the coupon redeemed
             """
-            SUBMIT_DIALOG = {
-                "Success": "You have successfully redeemed the coupon code.",
-                "Already Redeemed": "This coupon code cannot be used multiple times.",
-                "Invalid": "You cannot use this coupon code."
-            }
 
             # Wait for the alert to load
-            alert = self.short_wait.until(
-                method=expected_conditions.alert_is_present())
+            with METRICS.time(stage="alert"):
+                alert_text = self.driver.wait_for_alert(timeout=self.short_wait)
 
             # Check for the status of the coupon redeem
-            for status, message in SUBMIT_DIALOG.items():
-                if message in alert.text:
-                    alert.accept()
+            for status, message in self.SUBMIT_DIALOG.items():
+                if message in alert_text:
+                    self.driver.accept_alert()
                     return status
 
-            # If no status was found,
-            # raise an exception
-            raise Exception("Exceded maximum redeem attempts.")
+            # If no status was found, the redeem attempts were exceeded,
+            # dismiss the alert so that the page can be used again
+            self.driver.accept_alert()
+            raise RateLimitError("Exceded maximum redeem attempts.")
 
-        # Navigate to the coupon redeem page
-        self.webdriver.get(url=self.COUPON_REDEEM_PAGE)
+        self.coupon_count += 1
 
-        try:
-            # Check if its the correct page
-            self.wait.until(
-                method=expected_conditions.url_contains(
-                    url="Shop/Coupon"))
+        with METRICS.time(stage="submit"):
+            # Fill in the coupon code, clearing any code left from a previous submit
+            self.driver.fill(
+                selector=self.REDEEM_SELECTORS["coupon_form"], values=coupon.split("-"))
 
-            # Wait for the coupon redeem page to load
-            self.wait.until(
-                method=expected_conditions.presence_of_element_located(
-                    locator=(By.CSS_SELECTOR, REDEEM_SELECTORS["pa_navbar"])))
+            # Click the submit button,
+            # with Javascript to avoid element not interactable exception
+            self.driver.click(
+                selector=self.REDEEM_SELECTORS["submit_button"], script=True)
 
-        # If the coupon redeem page is unreachable,
+        # Handle any alert that appears after redeeming the coupon
+        return redeem_alert_handler()
+
+    def wait_confirmation_page(self) -> None:
+        """
+        Waits for the confirmation page that follows a successful redeem
+
+        :return: None
+        """
+
+        try:
+            # Wait for the confirmation page to load
+            self.driver.wait_for_url(
+                fragment="WebItemStorage/Complete", timeout=self.wait)
+
+        # If the confirmation page is unreachable,
         # raise an exception
-        except TimeoutException:
-            raise Exception("Coupon redeem page unreachable.")
+        except TimeoutError:
+            raise Exception("Redeem confirmation page unreachable.")
+
+    def redeem_coupon(self, coupon: str, region: str = None) -> dict:
+        """
+        Redeem a coupon code and returns a dictionary with the coupon code and status
+
+        :param coupon: The coupon code to redeem
+        :param region: Region of the coupon redeem page
+        :return: A dictionary with the coupon code and its status
+        """
 
-        # Find the input fields for the coupon code
-        coupon_form = self.webdriver.find_elements(
-            By.CSS_SELECTOR, REDEEM_SELECTORS["coupon_form"])
+        self.load_coupon_page(region=region)
 
-        # Fill in the coupon code
-        for coupon_input, coupon_slice in zip(coupon_form, coupon.split("-")):
-            coupon_input.send_keys(coupon_slice)
+        status = self.submit_coupon(coupon=coupon)
 
-        # Click the submit button
-        submit_button = self.webdriver.find_element(
-            By.CSS_SELECTOR, REDEEM_SELECTORS["submit_button"])
+        # If the coupon was redeemed,
+        # wait for the confirmation page
+        if status == "Success":
+            self.wait_confirmation_page()
 
-        # Javascript click to avoid element not interactable exception
-        self.webdriver.execute_script("arguments[0].click();", submit_button)
+        return {coupon: status}
 
-        # Handle any alert that appears after redeeming the coupon
-        status = redeem_alert_handler()
+    def redeem_coupons(self, coupons: list, region: str = None):
+        """
+        Redeem several coupon codes on the same coupon redeem page, only reloading it
+        after a successful redeem or if the page is no longer the coupon redeem page
 
-        # If the coupon was already redeemed or invalid,
-        # return a dictionary with the coupon code and status
-        if status != "Success":
-            return {coupon: status}
+        :param coupons: Iterable with the coupon codes to redeem
+        :param region: Region of the coupon redeem page
+        :return: Generator of dictionaries with each coupon code and its status
+        """
 
-        try:
-            # Wait for the confirmation page to load
-            self.wait.until(
-                method=expected_conditions.url_contains(
-                    url="WebItemStorage/Complete"))
+        # Spread the coupons across several tabs, if enabled
+        if self.tab_count > 1:
+            yield from self.redeem_coupons_in_tabs(coupons=coupons, region=region)
+            return
 
-            return {coupon: status}
+        page_loaded = False
 
-        # If the confirmation page is unreachable,
-        # raise an exception
-        except TimeoutException:
-            raise Exception("Redeem confirmation page unreachable.")
+        for coupon in coupons:
+
+            # If the previous coupon left the coupon redeem page,
+            # navigate to it again
+            if not page_loaded or "Shop/Coupon" not in self.driver.current_url:
+                self.load_coupon_page(region=region)
+
+            page_loaded = True
+
+            status = self.submit_coupon(coupon=coupon)
+
+            # If the coupon was redeemed, wait for the confirmation page,
+            # which requires navigating back for the next coupon
+            if status == "Success":
+                self.wait_confirmation_page()
+                page_loaded = False
+
+            yield {coupon: status}
+
+    def redeem_coupons_in_tabs(self, coupons: list, region: str = None):
+        """
+        Redeem several coupon codes across the tabs, each tab loading the coupon redeem
+        page of its next coupon while the coupons of the other tabs are submitted
+
+        :param coupons: Iterable with the coupon codes to redeem
+        :param region: Region of the coupon redeem page
+        :return: Generator of dictionaries with each coupon code and its status
+        """
+
+        coupons = iter(coupons)
+        coupon_redeem_page = self.get_coupon_redeem_page(region=region)
+
+        # Coupon assigned to each tab, in the order the tabs take their turn
+        assigned = dict()
+
+        def assign(tab: str) -> None:
+            """
+            Helper function that assigns the next coupon to a tab
+
+            :param tab: Handle of the tab
+            :return: None
+            """
+
+            coupon = next(coupons, None)
+
+            if coupon is not None:
+                assigned[tab] = coupon
+
+        # Start loading the coupon redeem page in every tab
+        for tab in self.open_tabs():
+            assign(tab=tab)
+
+            if tab not in assigned:
+                break
+
+            self.driver.switch_tab(tab=tab)
+            self.driver.navigate(url=coupon_redeem_page)
+
+        while assigned:
+            tab = next(iter(assigned))
+            coupon = assigned.pop(tab)
+
+            self.driver.switch_tab(tab=tab)
+
+            # The page has been loading since the tab got its coupon
+            with METRICS.time(stage="page_load"):
+                self.wait_coupon_page()
+
+            status = self.submit_coupon(coupon=coupon)
+
+            # If the coupon was redeemed, wait for the confirmation page,
+            # and navigate back for the next coupon of the tab
+            if status == "Success":
+                self.wait_confirmation_page()
+
+            yield {coupon: status}
+
+            assign(tab=tab)
+
+            if tab in assigned and status == "Success":
+                self.driver.navigate(url=coupon_redeem_page)
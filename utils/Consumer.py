@@ -0,0 +1,156 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from utils.Coupon import Coupon
+from utils.JobQueue import JobQueue
+from utils.Pool import Pool
+from utils.Worker import Worker
+
+
+class Consumer(Pool):
+    """ Redeems the jobs of a shared queue on the accounts this host has credentials for """
+
+    def __init__(self, queue: JobQueue, accounts: dict, workers: int = 1, **options):
+        """
+        Initializes a new instance of the Consumer class
+
+        :param queue: Job queue shared by every host
+        :param accounts: Dictionary with the account names and their user credentials
+        :param workers: Maximum number of accounts, and browsers, running at the same time
+        :param options: Keyword arguments passed on to every worker
+        """
+
+        super().__init__(workers=workers, **options)
+
+        self.queue = queue
+        self.accounts = accounts
+        self.workers = workers
+
+        # Identify the leases of this process among the other hosts
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+
+    def run(self) -> dict:
+        """
+        Leases the accounts with pending jobs one at a time on each worker,
+        until no account this host has credentials for is left
+
+        :returns: Dictionary with the account names and their results, each result
+        holds the coupons log of each region of the account and the error that stopped it,
+        if any
+        """
+
+        results = dict()
+
+        futures = [self.executor.submit(self.consume, results)
+                   for _ in range(self.workers)]
+
+        for future in futures:
+            future.result()
+
+        return results
+
+    def consume(self, results: dict) -> None:
+        """
+        Runs the leased accounts of a worker thread until no account is left
+
+        :param results: Dictionary the result of each account is added to
+        :returns: None
+        """
+
+        worker = f"{self.name}-{threading.current_thread().name}"
+
+        while True:
+            job = self.queue.lease_account(
+                worker=worker, accounts=list(self.accounts))
+
+            if not job:
+                return
+
+            account, regions = job
+            results[account] = self.run_account(
+                worker=worker, account=account, regions=regions)
+
+    def run_account(self, worker: str, account: str, regions: dict) -> dict:
+        """
+        Redeems the leased jobs of an account, renewing the lease while it runs
+
+        :param worker: Name of the worker holding the lease
+        :param account: Name of the leased account
+        :param regions: Dictionary with the regions and their coupon codes
+        :returns: Dictionary with the coupons log of each region of the account
+        and the error that stopped it, if any
+        """
+
+        logging.info(f"[{account}] Leased {sum(map(len, regions.values()))} job(s).")
+
+        # Each coupon only goes to the library of its region
+        coupons = [Coupon(code=code, region=region)
+                   for region, codes in regions.items() for code in codes]
+
+        stopped = threading.Event()
+
+        # Set once the lease is lost, to stop the account run
+        # before another worker uses the same account
+        lost = threading.Event()
+
+        def renew():
+            """
+            Helper function that renews the lease until the account run ends
+
+            :return: None
+            """
+
+            renewed = time.monotonic()
+
+            while not stopped.wait(timeout=self.queue.lease / 3):
+                try:
+                    if self.queue.renew(worker=worker, account=account):
+                        renewed = time.monotonic()
+                        continue
+
+                    logging.warning(f"[{account}] Lease lost to another worker.")
+
+                # If the queue is unavailable, like while locked by another host,
+                # retry until the lease would have expired
+                except sqlite3.Error as e:
+                    logging.warning(f"[{account}] Failed to renew lease. {e}")
+
+                    if time.monotonic() - renewed < self.queue.lease:
+                        continue
+
+                    logging.warning(f"[{account}] Lease expired.")
+
+                lost.set()
+                return
+
+        threading.Thread(target=renew, daemon=True).start()
+
+        try:
+            coupons_logs = Worker(
+                account, self.accounts[account], stop=lost,
+                **self.options).run(coupons=coupons)
+
+            # If the lease was lost after the last coupon,
+            # the jobs may already be handed to another worker
+            if lost.is_set():
+                raise Exception("Lease lost to another worker.")
+
+        # If the account run failed,
+        # hand its jobs out again
+        except Exception as e:
+            logging.error(f"[{account}] {e}")
+            self.queue.release(worker=worker, account=account)
+
+            return {"coupons": dict(), "error": str(e)}
+
+        finally:
+            stopped.set()
+
+        self.queue.complete(
+            worker=worker, account=account, coupons_logs=coupons_logs)
+
+        return {"coupons": coupons_logs, "error": None}
@@ -0,0 +1,101 @@
+import datetime
+import re
+from typing import NamedTuple
+
+
+class Coupon(NamedTuple):
+    """ A coupon code and the metadata of its source """
+
+    code: str
+    expiry: float = None
+    region: str = None
+    source: str = None
+
+    # Coupon codes are made of four segments, one per coupon form input
+    PATTERN = re.compile(r"[A-Z0-9]{4}(?:-[A-Z0-9]{4}){3}")
+
+    EXPIRY_FIELDS = ["expiry", "expires", "expire", "expires_at",
+                     "expiration", "expiration_date", "end_date", "valid_until"]
+    REGION_FIELDS = ["region", "server"]
+
+    # North America and Europe share the same shop
+    REGION_ALIASES = {"na": "naeu", "eu": "naeu", "euna": "naeu"}
+
+    # Coupon redeem page of each region shop
+    COUPON_REDEEM_PAGES = {
+        "naeu": "https://payment.naeu.playblackdesert.com/en-US/Shop/Coupon/",
+        "sa": "https://payment.sa.playblackdesert.com/pt-BR/Shop/Coupon/"
+    }
+
+    @classmethod
+    def from_entry(cls, entry: dict, source: str = None) -> "Coupon":
+        """
+        Creates a coupon from an entry of a JSON response,
+        reading the expiry and region from any of their known fields
+
+        :param entry: Dictionary with the coupon code and its metadata
+        :param source: Name of the source of the coupon
+        :returns: Coupon instance
+        """
+
+        expiry = next((entry[field] for field in cls.EXPIRY_FIELDS
+                       if entry.get(field)), None)
+        region = next((entry[field] for field in cls.REGION_FIELDS
+                       if entry.get(field)), None)
+
+        return cls(code=entry["code"], expiry=cls.parse_expiry(expiry=expiry),
+                   region=cls.normalize_region(region=region), source=source)
+
+    @staticmethod
+    def parse_expiry(expiry) -> float:
+        """
+        Converts an expiry date to a timestamp
+
+        :param expiry: Timestamp in seconds or milliseconds, or ISO formatted date
+        :returns: Timestamp in seconds, or None if the expiry date is unknown
+        """
+
+        if expiry is None:
+            return None
+
+        if isinstance(expiry, (int, float)):
+            # Timestamps in milliseconds are too large to be in seconds
+            return expiry / 1000 if expiry > 1e11 else float(expiry)
+
+        try:
+            date = datetime.datetime.fromisoformat(
+                str(expiry).strip().replace("Z", "+00:00"))
+
+        except ValueError:
+            return None
+
+        # Dates without a timezone are assumed to be in UTC
+        if not date.tzinfo:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+
+        return date.timestamp()
+
+    @classmethod
+    def normalize_region(cls, region) -> str:
+        """
+        Normalizes a region name, like "NA/EU" to "naeu"
+
+        :param region: Name of the region
+        :returns: Normalized name of the region, or None if the region is unknown
+        """
+
+        if not region:
+            return None
+
+        region = re.sub(r"[^a-z0-9]", "", str(region).lower())
+
+        return cls.REGION_ALIASES.get(region, region) or None
+
+    def is_valid(self) -> bool:
+        """
+        Checks if the coupon code has one segment per coupon form input
+
+        :returns: True if the coupon code is well-formed
+        """
+
+        return bool(self.PATTERN.fullmatch(self.code))
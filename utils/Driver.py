@@ -0,0 +1,992 @@
+import json
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+
+from utils.Tracer import TRACER
+
+
+class Driver:
+    """ Drives the browser of a bot, the base class of the browser backends """
+
+    # Methods put on the timeline of the run while tracing
+    TRACED_METHODS = ["open_tab", "switch_tab", "get", "navigate", "execute_script",
+                      "execute_cdp_cmd", "wait_for_element", "wait_for_any", "wait_for_url",
+                      "wait_for_alert", "accept_alert", "click", "fill",
+                      "get_network_events", "get_text", "delete_all_cookies"]
+
+    def __init__(self, headless: bool = True, measure: bool = False):
+        """
+        Initializes a new instance of the Driver class
+
+        :param headless: Run the browser without a window
+        :param measure: Record the network events to measure the transferred bytes
+        """
+
+        self.headless = headless
+        self.measure = measure
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.quit()
+
+    def trace(self) -> None:
+        """
+        Puts every call to the driver on the timeline of the run, if tracing is enabled
+
+        :returns: None
+        """
+
+        TRACER.instrument(
+            instance=self, methods=self.TRACED_METHODS, category="driver")
+
+    @property
+    def current_url(self) -> str:
+        """
+        Returns the URL of the current page
+
+        :returns: URL of the current page
+        """
+
+        raise NotImplementedError
+
+    @property
+    def current_tab(self) -> str:
+        """
+        Returns the handle of the current tab
+
+        :returns: Handle of the current tab
+        """
+
+        raise NotImplementedError
+
+    def open_tab(self) -> str:
+        """
+        Opens a new tab sharing the cookies of the others, and switches to it
+
+        :returns: Handle of the new tab
+        """
+
+        raise NotImplementedError
+
+    def switch_tab(self, tab: str) -> None:
+        """
+        Switches the following commands to the given tab
+
+        :param tab: Handle of the tab
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def get(self, url: str) -> None:
+        """
+        Navigates to the given URL and waits for the page to load
+
+        :param url: URL to navigate to
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def navigate(self, url: str) -> None:
+        """
+        Starts navigating to the given URL, without waiting for the page to load
+
+        :param url: URL to navigate to
+        :returns: None
+        """
+
+        self.execute_script("window.location.href = arguments[0];", url)
+
+    def execute_script(self, script: str, *args):
+        """
+        Runs a script on the current page, with the given arguments in its arguments list
+
+        :param script: Body of the function to run
+        :param args: JSON serializable arguments of the function
+        :returns: Value returned by the function
+        """
+
+        raise NotImplementedError
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict = None) -> dict:
+        """
+        Sends a Chrome DevTools Protocol command to the current page
+
+        :param cmd: Name of the command
+        :param cmd_args: Dictionary with the parameters of the command
+        :returns: Dictionary with the result of the command
+        """
+
+        raise NotImplementedError
+
+    def wait_for_element(self, selector: str, timeout: float) -> None:
+        """
+        Waits for an element matching the selector to be present on the page
+
+        :param selector: CSS selector of the element
+        :param timeout: Number of seconds to wait
+        :returns: None
+        """
+
+        self.wait_for_any(selectors={selector: selector}, timeout=timeout)
+
+    def wait_for_any(self, selectors: dict, timeout: float) -> str:
+        """
+        Waits for any of several elements to be present on the page,
+        watching them all at once instead of one after the other
+
+        :param selectors: Dictionary with the name of each outcome and its CSS selector
+        :param timeout: Number of seconds to wait
+        :returns: Name of the first outcome whose element is present
+        """
+
+        raise NotImplementedError
+
+    def wait_for_url(self, fragment: str, timeout: float) -> None:
+        """
+        Waits for the URL of the current page to contain the given fragment
+
+        :param fragment: Part of the URL to wait for
+        :param timeout: Number of seconds to wait
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def wait_for_alert(self, timeout: float) -> str:
+        """
+        Waits for an alert to open
+
+        :param timeout: Number of seconds to wait
+        :returns: Text of the alert
+        """
+
+        raise NotImplementedError
+
+    def accept_alert(self) -> None:
+        """
+        Accepts the open alert
+
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def click(self, selector: str, script: bool = False) -> None:
+        """
+        Clicks the first element matching the selector
+
+        :param selector: CSS selector of the element
+        :param script: Click through Javascript, to avoid the element not interactable
+        errors, instead of with the mouse
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def fill(self, selector: str, values: list) -> None:
+        """
+        Types the given values in the inputs matching the selector, clearing them first
+
+        :param selector: CSS selector of the inputs
+        :param values: List with the value of each input, in order
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def get_network_events(self) -> list:
+        """
+        Returns the network events recorded since the last call, if measuring is enabled
+
+        :returns: List with the method and parameters of each network event
+        """
+
+        raise NotImplementedError
+
+    def quit(self) -> None:
+        """
+        Closes the browser
+
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def get_text(self, selector: str) -> str:
+        """
+        Returns the text of the first element matching the selector
+
+        :param selector: CSS selector of the element
+        :returns: Text of the element, or an empty string if it is not found
+        """
+
+        return self.execute_script("""
+            const element = document.querySelector(arguments[0]);
+            return element ? element.innerText : "";
+        """, selector)
+
+    def delete_all_cookies(self) -> None:
+        """
+        Deletes the cookies of every domain
+
+        :returns: None
+        """
+
+        self.execute_cdp_cmd(cmd="Network.clearBrowserCookies", cmd_args={})
+
+    @property
+    def process_id(self) -> int:
+        """
+        Returns the process id the browser processes descend from
+
+        :returns: Process id, or None if it is unknown
+        """
+
+        raise NotImplementedError
+
+    def get_process_ids(self) -> list:
+        """
+        Returns the process ids of the browser, including the renderers and other
+        Chrome processes
+
+        :returns: List with the process ids, the root process first
+        """
+
+        root = self.process_id
+
+        if not root:
+            return list()
+
+        # Use psutil if it is installed,
+        # it also works outside Linux
+        try:
+            import psutil
+
+            try:
+                return [root] + [process.pid for process in
+                                 psutil.Process(root).children(recursive=True)]
+
+            except psutil.Error:
+                return list()
+
+        except ImportError:
+            pass
+
+        children = dict()
+
+        for entry in os.listdir("/proc") if os.path.isdir("/proc") else list():
+            if not entry.isdigit():
+                continue
+
+            try:
+                with open(f"/proc/{entry}/stat") as file:
+                    # The process name may hold spaces and parentheses,
+                    # the parent id follows the state after it
+                    parent = int(file.read().rsplit(")", 1)[1].split()[1])
+
+            except (OSError, IndexError, ValueError):
+                continue
+
+            children.setdefault(parent, list()).append(int(entry))
+
+        process_ids = [root]
+
+        for process_id in process_ids:
+            process_ids.extend(children.get(process_id, list()))
+
+        return process_ids
+
+    def get_memory(self) -> int:
+        """
+        Returns the resident memory of every browser process together
+
+        :returns: Number of bytes, 0 if it cannot be measured on this platform
+        """
+
+        process_ids = self.get_process_ids()
+
+        try:
+            import psutil
+
+            memory = 0
+
+            for process_id in process_ids:
+                try:
+                    memory += psutil.Process(process_id).memory_info().rss
+
+                except psutil.Error:
+                    pass
+
+            return memory
+
+        except ImportError:
+            pass
+
+        page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        memory = 0
+
+        for process_id in process_ids:
+            try:
+                with open(f"/proc/{process_id}/statm") as file:
+                    memory += int(file.read().split()[1]) * page_size
+
+            except (OSError, IndexError, ValueError):
+                pass
+
+        return memory
+
+    def kill(self, process_ids: list = None) -> None:
+        """
+        Kills the browser processes, for a browser that no longer responds
+
+        :param process_ids: List with the process ids to kill,
+        every current browser process if not provided
+        :returns: None
+        """
+
+        for process_id in process_ids if process_ids is not None else self.get_process_ids():
+            try:
+                os.kill(process_id, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+            except OSError:
+                pass
+
+
+class SeleniumDriver(Driver):
+    """ Drives Chrome through chromedriver and the WebDriver protocol """
+
+    def __init__(self, headless: bool = True, measure: bool = False):
+        super().__init__(headless=headless, measure=measure)
+
+        # Only import selenium when it is the selected backend
+        from selenium import webdriver
+
+        self.webdriver_options = webdriver.ChromeOptions()
+        # Run selenium in headless mode
+        if headless:
+            self.webdriver_options.add_argument(argument="--headless")
+        # Hide console logs
+        self.webdriver_options.add_experimental_option(
+            name="excludeSwitches", value=["enable-logging"])
+
+        # Record the network events to measure the transferred bytes
+        if measure:
+            self.webdriver_options.set_capability(
+                "goog:loggingPrefs", {"performance": "ALL"})
+
+        self.webdriver = webdriver.Chrome(options=self.webdriver_options)
+
+    def trace(self) -> None:
+        super().trace()
+
+        # Every WebDriver command goes through a single round trip to chromedriver
+        TRACER.instrument(
+            instance=self.webdriver, methods=["execute"], category="webdriver",
+            name=lambda method_name, driver_command, *args, **kwargs: driver_command)
+
+    @property
+    def current_url(self) -> str:
+        return self.webdriver.current_url
+
+    @property
+    def current_tab(self) -> str:
+        return self.webdriver.current_window_handle
+
+    def open_tab(self) -> str:
+        self.webdriver.switch_to.new_window("tab")
+
+        return self.webdriver.current_window_handle
+
+    def switch_tab(self, tab: str) -> None:
+        self.webdriver.switch_to.window(tab)
+
+    def wait(self, condition, timeout: float):
+        """
+        Polls the condition until it is met
+
+        :param condition: Selenium expected condition
+        :param timeout: Number of seconds to wait
+        :returns: Value returned by the condition
+        """
+
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        try:
+            return WebDriverWait(driver=self.webdriver, timeout=timeout).until(
+                method=condition)
+
+        except TimeoutException:
+            raise TimeoutError()
+
+    def get(self, url: str) -> None:
+        self.webdriver.get(url=url)
+
+    def execute_script(self, script: str, *args):
+        return self.webdriver.execute_script(script, *args)
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict = None) -> dict:
+        return self.webdriver.execute_cdp_cmd(cmd=cmd, cmd_args=cmd_args or dict())
+
+    def wait_for_element(self, selector: str, timeout: float) -> None:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+
+        self.wait(condition=expected_conditions.presence_of_element_located(
+            locator=(By.CSS_SELECTOR, selector)), timeout=timeout)
+
+    def wait_for_any(self, selectors: dict, timeout: float) -> str:
+        from selenium.webdriver.common.by import By
+
+        # Check every selector on each poll, the first one present wins
+        return self.wait(condition=lambda webdriver: next(
+            (name for name, selector in selectors.items()
+             if webdriver.find_elements(By.CSS_SELECTOR, selector)), False), timeout=timeout)
+
+    def wait_for_url(self, fragment: str, timeout: float) -> None:
+        from selenium.webdriver.support import expected_conditions
+
+        self.wait(condition=expected_conditions.url_contains(
+            url=fragment), timeout=timeout)
+
+    def wait_for_alert(self, timeout: float) -> str:
+        from selenium.webdriver.support import expected_conditions
+
+        return self.wait(
+            condition=expected_conditions.alert_is_present(), timeout=timeout).text
+
+    def accept_alert(self) -> None:
+        self.webdriver.switch_to.alert.accept()
+
+    def click(self, selector: str, script: bool = False) -> None:
+        from selenium.webdriver.common.by import By
+
+        element = self.webdriver.find_element(By.CSS_SELECTOR, selector)
+
+        if script:
+            self.webdriver.execute_script("arguments[0].click();", element)
+        else:
+            element.click()
+
+    def fill(self, selector: str, values: list) -> None:
+        from selenium.webdriver.common.by import By
+
+        for element, value in zip(
+                self.webdriver.find_elements(By.CSS_SELECTOR, selector), values):
+            element.clear()
+            element.send_keys(value)
+
+    def get_network_events(self) -> list:
+        if not self.measure:
+            return list()
+
+        events = list()
+
+        for entry in self.webdriver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            events.append((message["method"], message.get("params", dict())))
+
+        return events
+
+    @property
+    def process_id(self) -> int:
+        # Chrome is started by chromedriver
+        process = getattr(self.webdriver.service, "process", None)
+
+        return process.pid if process else None
+
+    def quit(self) -> None:
+        self.webdriver.quit()
+
+
+class CdpDriver(Driver):
+    """ Drives Chrome directly over the Chrome DevTools Protocol, waiting on the page events """
+
+    CHROME_BINARIES = ["google-chrome", "google-chrome-stable",
+                       "chromium", "chromium-browser", "chrome"]
+
+    STARTUP_TIMEOUT = 15
+    COMMAND_TIMEOUT = 30
+    PAGE_LOAD_TIMEOUT = 30
+
+    # Events only recorded to measure the transferred bytes
+    NETWORK_EVENTS = ["Network.loadingFinished", "Network.loadingFailed"]
+
+    def __init__(self, headless: bool = True, measure: bool = False):
+        super().__init__(headless=headless, measure=measure)
+
+        # Only import the WebSocket client when it is the selected backend
+        try:
+            import websocket
+
+        except ImportError:
+            raise Exception(
+                "The cdp backend requires the websocket-client package.")
+
+        binary = os.environ.get("CHROME_BINARY") or next(
+            filter(None, map(shutil.which, self.CHROME_BINARIES)), None)
+
+        # If Chrome is not installed,
+        # raise an exception
+        if not binary:
+            raise Exception("Chrome executable not found, set CHROME_BINARY.")
+
+        self.user_data_dir = tempfile.mkdtemp(prefix="couponwizard-")
+
+        arguments = [binary, "--remote-debugging-port=0", "--remote-allow-origins=*",
+                     f"--user-data-dir={self.user_data_dir}",
+                     "--no-first-run", "--no-default-browser-check", "about:blank"]
+
+        if headless:
+            arguments.insert(1, "--headless=new")
+
+        self.process = subprocess.Popen(
+            arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Commands are answered, and events received, by a background reader
+        self.condition = threading.Condition()
+        self.send_lock = threading.Lock()
+        self.responses = dict()
+        self.command_id = 0
+        self.closed = False
+
+        # Numbered, so that each wait only looks at the events that followed it
+        self.events = deque(maxlen=1000)
+        self.event_count = 0
+        self.network_events = list()
+
+        # Each tab is a session of the browser connection,
+        # with its own target and open alert
+        self.session = None
+        self.targets = dict()
+        self.dialogs = dict()
+
+        try:
+            self.socket = websocket.create_connection(
+                self.get_browser_url(), suppress_origin=True)
+
+        except Exception:
+            self.quit()
+            raise
+
+        threading.Thread(target=self.read, daemon=True).start()
+
+        target = next(target for target in self.send(cmd="Target.getTargets")["targetInfos"]
+                      if target["type"] == "page")
+
+        self.session = self.attach(target_id=target["targetId"])
+
+    def get_browser_url(self) -> str:
+        """
+        Waits for Chrome to start and returns the WebSocket URL of the browser
+
+        :returns: WebSocket URL of the browser
+        """
+
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+
+        # Chrome writes the port it listens on, and the browser path, once it is ready
+        while True:
+            if os.path.exists(port_file):
+                with open(port_file) as file:
+                    lines = file.read().split()
+
+                if len(lines) == 2:
+                    return f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+
+            if self.process.poll() is not None:
+                raise Exception("Chrome failed to start.")
+
+            if time.monotonic() > deadline:
+                raise Exception("Chrome startup timeout.")
+
+            time.sleep(0.05)
+
+    def attach(self, target_id: str) -> str:
+        """
+        Attaches to a page and enables its events
+
+        :param target_id: Identifier of the page target
+        :returns: Identifier of the session of the page
+        """
+
+        session = self.send(cmd="Target.attachToTarget", cmd_args={
+            "targetId": target_id, "flatten": True})["sessionId"]
+
+        self.targets[session] = target_id
+
+        self.send(cmd="Page.enable", session=session)
+
+        if self.measure:
+            self.send(cmd="Network.enable", session=session)
+
+        return session
+
+    def read(self) -> None:
+        """
+        Receives the command responses and the events of the pages, until the browser closes
+
+        :returns: None
+        """
+
+        while True:
+            try:
+                message = json.loads(self.socket.recv())
+
+            # If the connection was closed,
+            # wake up every pending command and wait
+            except Exception:
+                with self.condition:
+                    self.closed = True
+                    self.condition.notify_all()
+                return
+
+            session = message.get("sessionId")
+            method = message.get("method")
+            params = message.get("params", dict())
+
+            with self.condition:
+                if "id" in message:
+                    self.responses[message["id"]] = message
+
+                elif method in self.NETWORK_EVENTS:
+                    if self.measure:
+                        self.network_events.append((method, params))
+
+                else:
+                    self.event_count += 1
+                    self.events.append((self.event_count, session, method, params))
+
+                    if method == "Page.javascriptDialogOpening":
+                        self.dialogs[session] = params.get("message", "")
+
+                    elif method == "Page.javascriptDialogClosed":
+                        self.dialogs.pop(session, None)
+
+                self.condition.notify_all()
+
+    def trace(self) -> None:
+        super().trace()
+
+        # Every DevTools command goes through a single round trip to the browser
+        TRACER.instrument(
+            instance=self, methods=["send"], category="cdp",
+            name=lambda method_name, *args, **kwargs: kwargs.get("cmd") or args[0])
+
+    def send(self, cmd: str, cmd_args: dict = None, session: str = None) -> dict:
+        """
+        Sends a Chrome DevTools Protocol command and waits for its result
+
+        :param cmd: Name of the command
+        :param cmd_args: Dictionary with the parameters of the command
+        :param session: Identifier of the page session, the browser itself if not provided
+        :returns: Dictionary with the result of the command
+        """
+
+        with self.condition:
+            self.command_id += 1
+            command_id = self.command_id
+
+        message = {"id": command_id, "method": cmd, "params": cmd_args or dict()}
+
+        if session:
+            message["sessionId"] = session
+
+        with self.send_lock:
+            self.socket.send(json.dumps(message))
+
+        with self.condition:
+            answered = self.condition.wait_for(
+                predicate=lambda: command_id in self.responses or self.closed,
+                timeout=self.COMMAND_TIMEOUT)
+
+            if not answered:
+                raise TimeoutError(f"{cmd} timeout.")
+
+            if command_id not in self.responses:
+                raise Exception("Browser connection closed.")
+
+            response = self.responses.pop(command_id)
+
+        if "error" in response:
+            raise Exception(f"{cmd} failed. {response['error'].get('message')}")
+
+        return response.get("result", dict())
+
+    def wait_event(self, methods: list, since: int, timeout: float) -> dict:
+        """
+        Waits for any of the given events of the current tab to follow the given event number
+
+        :param methods: List with the names of the events to wait for
+        :param since: Number of the last event seen before waiting
+        :param timeout: Number of seconds to wait
+        :returns: Dictionary with the parameters of the event
+        """
+
+        def find():
+            for number, session, method, params in self.events:
+                if number > since and session == self.session and method in methods:
+                    return method, params
+
+            return None
+
+        with self.condition:
+            event = self.condition.wait_for(
+                predicate=lambda: find() or self.closed, timeout=timeout)
+
+        if event is True:
+            raise Exception("Browser connection closed.")
+
+        if not event:
+            raise TimeoutError()
+
+        return event[1]
+
+    @property
+    def current_url(self) -> str:
+        # Read from the navigation history, which works even with an alert open
+        history = self.execute_cdp_cmd(cmd="Page.getNavigationHistory")
+
+        return history["entries"][history["currentIndex"]]["url"]
+
+    @property
+    def current_tab(self) -> str:
+        return self.session
+
+    def open_tab(self) -> str:
+        target_id = self.send(
+            cmd="Target.createTarget", cmd_args={"url": "about:blank"})["targetId"]
+
+        self.session = self.attach(target_id=target_id)
+
+        return self.session
+
+    def switch_tab(self, tab: str) -> None:
+        self.session = tab
+
+        # Bring the tab to the front, where its timers are not throttled
+        self.send(cmd="Target.activateTarget",
+                  cmd_args={"targetId": self.targets[tab]})
+
+    def get(self, url: str) -> None:
+        since = self.event_count
+
+        result = self.execute_cdp_cmd(cmd="Page.navigate", cmd_args={"url": url})
+
+        if result.get("errorText"):
+            raise Exception(f"Navigation failed. {result['errorText']}")
+
+        try:
+            self.wait_event(methods=["Page.loadEventFired"], since=since,
+                            timeout=self.PAGE_LOAD_TIMEOUT)
+
+        # Like WebDriver, give up on the load event
+        # without failing the navigation
+        except TimeoutError:
+            pass
+
+    def execute_script(self, script: str, *args):
+        result = self.execute_cdp_cmd(cmd="Runtime.evaluate", cmd_args={
+            "expression": f"(function() {{ {script} }}).apply(null, {json.dumps(args)})",
+            "returnByValue": True,
+            "awaitPromise": True})
+
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise Exception(
+                f"Script failed. {details.get('exception', dict()).get('description') or details.get('text')}")
+
+        return result["result"].get("value")
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict = None) -> dict:
+        return self.send(cmd=cmd, cmd_args=cmd_args, session=self.session)
+
+    def wait_for_any(self, selectors: dict, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            remaining = deadline - time.monotonic()
+            since = self.event_count
+
+            try:
+                # Resolve as soon as any of the elements is added to the page,
+                # instead of polling for them
+                found = self.execute_script("""
+                    const selectors = Object.entries(arguments[0]);
+                    const timeout = arguments[1];
+
+                    const find = () => {
+                        const found = selectors.find(([name, selector]) =>
+                            document.querySelector(selector));
+                        return found ? found[0] : null;
+                    };
+
+                    return new Promise(resolve => {
+                        if (find()) {
+                            return resolve(find());
+                        }
+
+                        const observer = new MutationObserver(() => {
+                            const name = find();
+
+                            if (name) {
+                                observer.disconnect();
+                                clearTimeout(timer);
+                                resolve(name);
+                            }
+                        });
+
+                        observer.observe(document, { childList: true, subtree: true });
+
+                        const timer = setTimeout(() => {
+                            observer.disconnect();
+                            resolve(null);
+                        }, timeout);
+                    });
+                """, selectors, max(remaining, 0) * 1000)
+
+            # If the page navigated away while waiting,
+            # wait again on the next page
+            except Exception:
+                found = None
+
+                try:
+                    self.wait_event(methods=["Page.frameNavigated"], since=since,
+                                    timeout=max(deadline - time.monotonic(), 0))
+                    continue
+
+                except TimeoutError:
+                    pass
+
+            if found:
+                return found
+
+            if time.monotonic() >= deadline:
+                raise TimeoutError()
+
+    def wait_for_url(self, fragment: str, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            since = self.event_count
+
+            if fragment in self.current_url:
+                return
+
+            # Wait for the next navigation instead of polling the URL
+            self.wait_event(
+                methods=["Page.frameNavigated", "Page.navigatedWithinDocument"],
+                since=since, timeout=max(deadline - time.monotonic(), 0))
+
+    def wait_for_alert(self, timeout: float) -> str:
+        with self.condition:
+            self.condition.wait_for(
+                predicate=lambda: self.session in self.dialogs or self.closed,
+                timeout=timeout)
+
+            if self.session not in self.dialogs:
+                raise TimeoutError()
+
+            return self.dialogs[self.session]
+
+    def accept_alert(self) -> None:
+        self.execute_cdp_cmd(
+            cmd="Page.handleJavaScriptDialog", cmd_args={"accept": True})
+
+        with self.condition:
+            self.dialogs.pop(self.session, None)
+
+    def click(self, selector: str, script: bool = False) -> None:
+        if script:
+            # Click after the script returns, so that an alert opened by the click
+            # does not block the script result
+            self.execute_script("""
+                const element = document.querySelector(arguments[0]);
+
+                if (!element) {
+                    throw new Error("Element not found.");
+                }
+
+                setTimeout(() => element.click());
+            """, selector)
+            return
+
+        center = self.execute_script("""
+            const element = document.querySelector(arguments[0]);
+
+            if (!element) {
+                throw new Error("Element not found.");
+            }
+
+            element.scrollIntoView({ block: "center" });
+            const rect = element.getBoundingClientRect();
+
+            return { x: rect.left + rect.width / 2, y: rect.top + rect.height / 2 };
+        """, selector)
+
+        for event in ["mousePressed", "mouseReleased"]:
+            self.execute_cdp_cmd(cmd="Input.dispatchMouseEvent", cmd_args={
+                "type": event, "button": "left", "clickCount": 1, **center})
+
+    def fill(self, selector: str, values: list) -> None:
+        for index, value in enumerate(values):
+
+            # Select the current value, so that typing replaces it
+            if not self.execute_script("""
+                const input = document.querySelectorAll(arguments[0])[arguments[1]];
+
+                if (!input) {
+                    return false;
+                }
+
+                input.focus();
+                input.select();
+                return true;
+            """, selector, index):
+                return
+
+            # Type the value like a keyboard would,
+            # firing the input events the page listens to
+            self.execute_cdp_cmd(
+                cmd="Input.insertText", cmd_args={"text": value})
+
+    def get_network_events(self) -> list:
+        with self.condition:
+            events, self.network_events = self.network_events, list()
+
+        return events
+
+    @property
+    def process_id(self) -> int:
+        return self.process.pid
+
+    def quit(self) -> None:
+        if getattr(self, "socket", None):
+            self.socket.close()
+
+        self.process.terminate()
+
+        try:
+            self.process.wait(timeout=5)
+
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+DRIVERS = {
+    "selenium": SeleniumDriver,
+    "cdp": CdpDriver
+}
@@ -0,0 +1,281 @@
+import json
+import logging
+import os
+import stat
+import sys
+import threading
+import time
+
+from utils.Requester import Requester
+
+
+class Intake:
+    """ Receives coupons pushed over HTTP or a line stream, and hands them out in batches """
+
+    SOURCE = "push"
+
+    # Number of seconds without a new push before a burst is handed out
+    BATCH_WINDOW = 1
+
+    # Maximum number of seconds a burst is held back, even if pushes keep coming
+    MAX_BATCH_DELAY = 5
+
+    # Number of seconds between the checks for lines appended to a regular file
+    FOLLOW_INTERVAL = 0.5
+
+    def __init__(self, port: int = None, host: str = "127.0.0.1", stream: str = None,
+                 region: str = None, batch_window: float = BATCH_WINDOW):
+        """
+        Initializes a new instance of the Intake class
+
+        :param port: Port of the HTTP endpoint the coupons are posted to, none if not provided
+        :param host: Address the HTTP endpoint listens on
+        :param stream: Name of the file or FIFO the coupons are written to, one or more
+        per line, "-" to read them from the standard input, none if not provided,
+        a regular file is followed like with tail -f
+        :param region: Region of the coupons to keep, the coupons of
+        any region are kept if not provided
+        :param batch_window: Number of seconds without a new push before a burst
+        of coupons is handed out
+        """
+
+        self.batch_window = batch_window
+
+        # Pushed coupons go through the same normalization and screening
+        # as the ones of the coupon sources
+        self.requester = Requester(region=region)
+
+        # Pushed from the endpoint and stream threads
+        self.condition = threading.Condition()
+
+        # Coupons waiting for the next batch, and the ones of the batch being redeemed
+        self.pending = dict()
+        self.in_flight = set()
+
+        self.first_push = None
+        self.last_push = None
+
+        self.server = None
+
+        if port is not None:
+            self.serve(port=port, host=host)
+
+        if stream:
+            threading.Thread(
+                target=self.read_stream, args=(stream,), daemon=True).start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stops the HTTP endpoint, if any
+
+        :returns: None
+        """
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def parse(self, body: bytes) -> list:
+        """
+        Retrieves the coupons of a push, either a JSON list of coupons with their metadata,
+        like the Garmoth API, or any text with coupon codes
+
+        :param body: Body of the push
+        :returns: List with coupons
+        """
+
+        if body.lstrip().startswith(b"["):
+            try:
+                return self.requester.parse_coupons(
+                    chunks=[body], format="garmoth", source=self.SOURCE)
+
+            # If the list is not a list of coupons,
+            # scan it for coupon codes
+            except Exception:
+                pass
+
+        return self.requester.parse_coupons(
+            chunks=[body], format="text", source=self.SOURCE)
+
+    def push(self, coupons: list) -> int:
+        """
+        Adds coupons to the next batch, skipping the ones already pending or being redeemed
+
+        :param coupons: List with coupons
+        :returns: Number of coupons added
+        """
+
+        coupons = self.requester.screen_coupons(
+            coupons=self.requester.normalize_coupons(coupons=coupons))
+
+        with self.condition:
+            added = [coupon for coupon in coupons
+                     if coupon.code not in self.pending and coupon.code not in self.in_flight]
+
+            if not added:
+                return 0
+
+            for coupon in added:
+                self.pending[coupon.code] = coupon
+
+            now = time.monotonic()
+            self.first_push = self.first_push or now
+            self.last_push = now
+
+            self.condition.notify_all()
+
+        logging.info(f"Received {len(added)} pushed coupon(s).")
+
+        return len(added)
+
+    def next_batch(self, timeout: float = None, on_push=None) -> list:
+        """
+        Waits for pushed coupons and returns them once the burst settled,
+        so that the coupons pushed together are redeemed in the same session
+
+        :param timeout: Number of seconds to wait for a push, forever if not provided
+        :param on_push: Function called as soon as the first coupon is pushed,
+        while the burst settles
+        :returns: List with the pushed coupons, empty if none was pushed in time
+        """
+
+        with self.condition:
+            if not self.condition.wait_for(predicate=lambda: self.pending, timeout=timeout):
+                return list()
+
+        if on_push:
+            on_push()
+
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                remaining = min(self.last_push + self.batch_window,
+                                self.first_push + self.MAX_BATCH_DELAY) - now
+
+                if remaining <= 0:
+                    break
+
+                self.condition.wait(timeout=remaining)
+
+            batch = list(self.pending.values())
+
+            self.in_flight.update(self.pending)
+            self.pending.clear()
+            self.first_push = None
+
+        return batch
+
+    def done(self, batch: list) -> None:
+        """
+        Marks the coupons of a batch as redeemed, letting them be pushed again
+
+        :param batch: List with the coupons of the batch
+        :returns: None
+        """
+
+        with self.condition:
+            self.in_flight.difference_update(coupon.code for coupon in batch)
+
+    def read_stream(self, stream: str) -> None:
+        """
+        Pushes the coupons of every line of a FIFO, reopening it whenever its writer
+        closes it, of a regular file, following the lines appended to it,
+        or of the standard input until it ends
+
+        :param stream: Name of the FIFO or file, or "-" for the standard input
+        :returns: None
+        """
+
+        try:
+            if stream == "-":
+                self.read_lines(file=sys.stdin.buffer)
+
+            # A FIFO ends whenever its writer closes it,
+            # reopen it for the next writer
+            elif stat.S_ISFIFO(os.stat(stream).st_mode):
+                while True:
+                    with open(stream, "rb") as file:
+                        self.read_lines(file=file)
+
+            # A regular file is read once,
+            # then only the lines appended to it
+            else:
+                with open(stream, "rb") as file:
+                    self.read_lines(file=file, follow=True)
+
+        # If the stream is unreadable,
+        # stop reading it
+        except OSError as e:
+            logging.error(f"Failed to read pushed coupons. {e}")
+
+    def read_lines(self, file, follow: bool = False) -> None:
+        """
+        Pushes the coupons of every line of an open stream
+
+        :param file: Stream opened in binary mode
+        :param follow: Keep waiting for the lines appended once the end is reached,
+        instead of returning
+        :returns: None
+        """
+
+        while True:
+            position = file.tell() if follow else None
+            line = file.readline()
+
+            # Wait for the rest of a line still being written,
+            # or for a new line
+            if follow and not line.endswith(b"\n"):
+                file.seek(position)
+                time.sleep(self.FOLLOW_INTERVAL)
+                continue
+
+            if not line:
+                return
+
+            if line.strip():
+                self.push(coupons=self.parse(body=line))
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """
+        Receives the coupons posted to an HTTP endpoint in the background
+
+        :param port: Port of the endpoint
+        :param host: Address the endpoint listens on
+        :returns: HTTP server of the endpoint
+        """
+
+        # Only import the HTTP server once the endpoint is enabled
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        intake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status: int, data: dict):
+                body = json.dumps(data).encode()
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+                self.send_json(status=202, data={
+                    "queued": intake.push(coupons=intake.parse(body=body))})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return self.server
@@ -0,0 +1,229 @@
+import contextlib
+import threading
+import time
+
+
+class JobQueue:
+    """ A queue of (account, coupon) jobs shared by the workers of several hosts """
+
+    QUEUE_FILE = "queue.db"
+
+    # Number of failed leases before a job is given up
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, queue_file: str = QUEUE_FILE, lease: float = 600):
+        """
+        Initializes a new instance of the JobQueue class
+
+        :param queue_file: Name of the SQLite file of the queue, shared by every host
+        :param lease: Number of seconds an account stays leased to a worker without renewal,
+        after which its jobs are released to the other workers
+        """
+
+        # Only import SQLite when the queue is used
+        import sqlite3
+
+        self.lease = lease
+
+        # The queue is used from the worker threads
+        self.connection = sqlite3.connect(
+            queue_file, timeout=30, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+
+        # Let the workers read while another one writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "account TEXT NOT NULL, region TEXT NOT NULL, coupon TEXT NOT NULL, "
+            "state TEXT NOT NULL DEFAULT 'pending', status TEXT, worker TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (account, region, coupon))")
+
+        # A single worker holds each account at a time
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "account TEXT PRIMARY KEY, worker TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Releases the queue file
+
+        :returns: None
+        """
+
+        self.connection.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Starts a write transaction, locking the queue for the other hosts until it ends
+
+        :returns: Context manager committing the transaction, or rolling it back on error
+        """
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+
+            try:
+                yield self.connection
+
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+            self.connection.execute("COMMIT")
+
+    def add_jobs(self, account: str, region: str, coupons: list) -> int:
+        """
+        Adds a job for each coupon of an account region, skipping the jobs already queued,
+        and queues again the ones given up, like after the website was down for every attempt
+
+        :param account: Name of the account
+        :param region: Region of the coupons
+        :param coupons: List with the coupon codes
+        :returns: Number of jobs added or queued again
+        """
+
+        with self.transaction() as connection:
+            return connection.executemany(
+                "INSERT INTO jobs (account, region, coupon) VALUES (?, ?, ?) "
+                "ON CONFLICT (account, region, coupon) DO UPDATE SET "
+                "state = 'pending', status = NULL, worker = NULL, attempts = 0 "
+                "WHERE state = 'failed'",
+                [(account, region, coupon) for coupon in coupons]).rowcount
+
+    def lease_account(self, worker: str, accounts: list) -> tuple:
+        """
+        Leases the pending jobs of the first available account to a worker,
+        taking over the accounts whose lease expired
+
+        :param worker: Name of the worker
+        :param accounts: List with the accounts the worker has credentials for
+        :returns: Tuple with the account name and a dictionary with its regions
+        and their coupon codes, or None if no account has pending jobs
+        """
+
+        now = time.time()
+
+        with self.transaction() as connection:
+            # Release the jobs of the workers that stopped renewing their lease
+            for account, in connection.execute(
+                    "SELECT account FROM leases WHERE expires < ?", (now,)).fetchall():
+                self.release_jobs(connection=connection, account=account)
+
+            for account in accounts:
+                if connection.execute(
+                        "SELECT 1 FROM leases WHERE account = ?", (account,)).fetchone():
+                    continue
+
+                jobs = connection.execute(
+                    "SELECT region, coupon FROM jobs WHERE account = ? AND state = 'pending'",
+                    (account,)).fetchall()
+
+                if not jobs:
+                    continue
+
+                connection.execute(
+                    "INSERT INTO leases (account, worker, expires) VALUES (?, ?, ?)",
+                    (account, worker, now + self.lease))
+                connection.execute(
+                    "UPDATE jobs SET state = 'leased', worker = ?, attempts = attempts + 1 "
+                    "WHERE account = ? AND state = 'pending'", (worker, account))
+
+                regions = dict()
+                for region, coupon in jobs:
+                    regions.setdefault(region, list()).append(coupon)
+
+                return account, regions
+
+        return None
+
+    def renew(self, worker: str, account: str) -> bool:
+        """
+        Extends the lease of an account held by a worker
+
+        :param worker: Name of the worker
+        :param account: Name of the leased account
+        :returns: True if the worker still held the lease
+        """
+
+        with self.transaction() as connection:
+            return connection.execute(
+                "UPDATE leases SET expires = ? WHERE account = ? AND worker = ?",
+                (time.time() + self.lease, account, worker)).rowcount > 0
+
+    def complete(self, worker: str, account: str, coupons_logs: dict) -> None:
+        """
+        Records the status of the redeemed jobs of an account and marks the others as done,
+        like the ones already in the account log, then releases the account
+
+        :param worker: Name of the worker
+        :param account: Name of the leased account
+        :param coupons_logs: Dictionary with the regions and their coupon codes and status
+        :returns: None
+        """
+
+        with self.transaction() as connection:
+            connection.executemany(
+                "UPDATE jobs SET state = 'done', status = ? "
+                "WHERE account = ? AND region = ? AND coupon = ? AND worker = ?",
+                [(status, account, region, coupon, worker)
+                 for region, coupons_log in coupons_logs.items()
+                 for coupon, status in coupons_log.items()])
+
+            connection.execute(
+                "UPDATE jobs SET state = 'done' "
+                "WHERE account = ? AND worker = ? AND state = 'leased'", (account, worker))
+            connection.execute(
+                "DELETE FROM leases WHERE account = ? AND worker = ?", (account, worker))
+
+    def release(self, worker: str, account: str) -> None:
+        """
+        Releases the jobs of an account after a failed run, to be retried by any worker
+
+        :param worker: Name of the worker
+        :param account: Name of the leased account
+        :returns: None
+        """
+
+        with self.transaction() as connection:
+            self.release_jobs(connection=connection, account=account, worker=worker)
+
+    def release_jobs(self, connection, account: str, worker: str = None) -> None:
+        """
+        Hands the leased jobs of an account out again, giving up the ones leased too often,
+        and removes the account lease
+
+        :param connection: Connection of the current transaction
+        :param account: Name of the account
+        :param worker: Name of the worker holding the lease, any worker if not provided
+        :returns: None
+        """
+
+        if worker and not connection.execute(
+                "SELECT 1 FROM leases WHERE account = ? AND worker = ?",
+                (account, worker)).fetchone():
+            return
+
+        connection.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "worker = NULL WHERE account = ? AND state = 'leased'",
+            (self.MAX_ATTEMPTS, account))
+        connection.execute("DELETE FROM leases WHERE account = ?", (account,))
+
+    def get_stats(self) -> dict:
+        """
+        Counts the jobs in each state
+
+        :returns: Dictionary with the job states and their number of jobs
+        """
+
+        with self.lock:
+            return dict(self.connection.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
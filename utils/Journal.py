@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import threading
+
+
+class Journal:
+    """ A write-ahead journal of the coupons redeemed by an account during a run """
+
+    JOURNAL_DIRECTORY = "journals"
+
+    def __init__(self, account: str, batch_size: int = 10, flush_interval: float = 1):
+        """
+        Initializes a new instance of the Journal class
+
+        :param account: Name of the account whose redeems are journaled
+        :param batch_size: Number of entries written to disk at once
+        :param flush_interval: Maximum number of seconds an entry waits to be written to disk,
+        even if no other entry follows it
+        """
+
+        # Replace any character that is not safe for a file name
+        file_name = re.sub(r"[^\w.@-]", "_", account)
+        self.journal_file = os.path.join(
+            self.JOURNAL_DIRECTORY, f"{file_name}.jsonl")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.buffer = list()
+
+        # Writes the buffered entries once the flush interval ends,
+        # like when the run waits for a cooldown after its last entry
+        self.timer = None
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.flush()
+
+    def append(self, coupons: dict) -> None:
+        """
+        Adds the status of redeemed coupons to the journal, writing them to disk
+        once the batch is full or the oldest entry waited for the flush interval
+
+        :param coupons: Dictionary with the coupon codes and their status
+        :returns: None
+        """
+
+        with self.lock:
+            self.buffer.extend(coupons.items())
+
+            if len(self.buffer) >= self.batch_size:
+                self.flush()
+
+            elif not self.timer:
+                self.timer = threading.Timer(interval=self.flush_interval, function=self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered entries to disk and waits for them to be persisted
+
+        :returns: None
+        """
+
+        with self.lock:
+            self.cancel_timer()
+
+            if not self.buffer:
+                return
+
+            os.makedirs(self.JOURNAL_DIRECTORY, exist_ok=True)
+
+            with open(self.journal_file, "a") as file:
+                file.write("".join(
+                    json.dumps({"coupon": coupon, "status": status}) + "\n"
+                    for coupon, status in self.buffer))
+
+                file.flush()
+                os.fsync(file.fileno())
+
+            self.buffer.clear()
+
+    def cancel_timer(self) -> None:
+        """
+        Cancels the pending timed flush, if any
+
+        :returns: None
+        """
+
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def replay(self) -> dict:
+        """
+        Reads the entries journaled by an interrupted run
+
+        :returns: Dictionary with the coupon codes and their status
+        """
+
+        coupons = dict()
+
+        try:
+            with open(self.journal_file) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+
+                    # Skip a line left incomplete by an interrupted write
+                    except json.JSONDecodeError:
+                        continue
+
+                    coupons[entry["coupon"]] = entry["status"]
+
+        except FileNotFoundError:
+            pass
+
+        return coupons
+
+    def clear(self) -> None:
+        """
+        Removes the journal once its entries are safely in the coupons log
+
+        :returns: None
+        """
+
+        with self.lock:
+            self.cancel_timer()
+            self.buffer.clear()
+
+        try:
+            os.remove(self.journal_file)
+
+        except FileNotFoundError:
+            pass
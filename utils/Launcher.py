@@ -0,0 +1,112 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Launcher:
+    """ Starts bots in the background, ahead of the accounts that will need them """
+
+    def __init__(self, count: int = 1, bot_options: dict = None):
+        """
+        Initializes a new instance of the Launcher class
+
+        :param count: Maximum number of bots started in the background
+        :param bot_options: Keyword arguments passed on to the bots
+        """
+
+        self.count = count
+        self.bot_options = bot_options or dict()
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=count, thread_name_prefix="Launcher")
+        self.futures = list()
+        self.started = False
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def start(self) -> None:
+        """
+        Starts the bots in the background, only once
+
+        :returns: None
+        """
+
+        with self.lock:
+            if self.started:
+                return
+
+            self.started = True
+
+            logging.info("Starting browser in the background...")
+
+            # Only import selenium once a browser is needed
+            from utils.Bot import Bot
+
+            self.futures = [
+                self.executor.submit(Bot, **self.bot_options)
+                for _ in range(self.count)]
+
+    def acquire(self):
+        """
+        Takes one of the bots started in the background, waiting for it to be ready
+
+        :returns: Bot instance, or None if no bot was started or it failed to start
+        """
+
+        with self.lock:
+            if not self.futures:
+                return None
+
+            future = self.futures.pop(0)
+
+        try:
+            return future.result()
+
+        # If the bot failed to start,
+        # let the caller start its own
+        except Exception as e:
+            logging.warning(f"Background browser failed to start. {e}")
+            return None
+
+    def close(self) -> None:
+        """
+        Cancels the bots that were not taken, closing the ones still starting
+        in the background, so that the run does not wait for them
+
+        :returns: None
+        """
+
+        with self.lock:
+            futures, self.futures = self.futures, list()
+
+        # Leave out the bots that did not start yet
+        futures = [future for future in futures if not future.cancel()]
+
+        if futures:
+            # Not a daemon thread, the bots must still be closed
+            # if the script ends in the meantime
+            threading.Thread(
+                target=self.close_bots, args=(futures,), name="LauncherClose").start()
+
+        self.executor.shutdown(wait=False)
+
+    def close_bots(self, futures: list) -> None:
+        """
+        Closes the bots started in the background that were not taken,
+        as soon as each one is ready
+
+        :param futures: List with the futures of the bots
+        :returns: None
+        """
+
+        for future in futures:
+            try:
+                future.result().__exit__(None, None, None)
+
+            except Exception:
+                pass
@@ -1,24 +1,92 @@
 import json
+import os
 import re
 
+from utils.Coupon import Coupon
+from utils.Journal import Journal
+from utils.Metrics import METRICS
+from utils.Outcomes import Outcomes
+from utils.SteamGuard import SteamGuard
+from utils.Storage import STORAGES
+from utils.Tracer import TRACER
+
 
 class Library:
     """ A library of coupons and user credentials data """
 
-    def __init__(self):
-        """ Initializes a new instance of the Library class """
+    DEFAULT_ACCOUNT = "default"
+    DEFAULT_REGION = "naeu"
+    LOG_DIRECTORY = "logs"
+
+    def __init__(self, account: str = DEFAULT_ACCOUNT, storage: str = "json",
+                 outcomes: Outcomes = None, region: str = DEFAULT_REGION,
+                 journal: bool = True):
+        """ 
+        Initializes a new instance of the Library class
+
+        :param account: Name of the account whose coupons log is loaded,
+        the default account uses the log.json file
+        :param storage: Name of the coupons log storage backend,
+        either "json", "jsonl" or "sqlite"
+        :param outcomes: Cache of the coupon outcomes shared by every account
+        :param region: Region of the coupons log, the regions other than the default one
+        have their own log, named after the account and the region
+        :param journal: Recover the coupons journaled by an interrupted run into the coupons log,
+        disable it for the libraries only opened for the credentials, which do not use
+        the storage selected for the run
+        """
+
+        if storage not in STORAGES:
+            raise Exception(f"Unknown storage {storage}.")
+
+        self.account = account
+        self.region = region
+        self.outcomes = outcomes
+
+        # Keep the log of the default region where it was before regions existed
+        log_name = account if region == self.DEFAULT_REGION else f"{account}.{region}"
+
+        if account == self.DEFAULT_ACCOUNT:
+            self.log_file = "log.json" if region == self.DEFAULT_REGION \
+                else f"log.{region}.json"
+        else:
+            # Replace any character that is not safe for a file name
+            file_name = re.sub(r"[^\w.@-]", "_", log_name)
+            self.log_file = os.path.join(
+                self.LOG_DIRECTORY, f"{file_name}.json")
 
-        self.log_file = "log.json"
         self.credentials_file = "user_credentials.json"
 
-        self.log = self.load_file(file_name=self.log_file)
+        self.storage = STORAGES[storage](
+            account=log_name, log_file=self.log_file)
+
+        # Recover the coupons redeemed by an interrupted run
+        self.journal = Journal(account=log_name) if journal else None
+        journaled_coupons = self.journal.replay() if journal else None
+
+        if journaled_coupons:
+            self.storage.add(coupons=journaled_coupons)
+            self.storage.flush()
+            self.journal.clear()
+
         self.user_credentials = self.load_file(file_name=self.credentials_file)
+        self.credentials_changed = False
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Writes the changed data and releases the coupons log storage
+
+        :returns: None
+        """
+
         self.update_files()
+        self.storage.close()
 
     def load_file(self, file_name: str) -> dict:
         """ 
@@ -38,32 +106,56 @@ class Library:
 
     def update_files(self) -> None:
         """ 
-        Writes the current data to their respective JSON files 
+        Writes the changed data to their respective files 
 
         :returns: None
         """
 
-        with open(self.log_file, "w+") as file:
-            json.dump(self.log, file)
+        with TRACER.span(name="log_write", account=self.account, region=self.region):
+            # Add any journaled coupon that did not reach the coupons log,
+            # like the ones of an interrupted run
+            if self.journal:
+                self.journal.flush()
+                self.storage.add(coupons=self.journal.replay())
+
+            self.storage.flush()
+
+            # The journaled coupons are now in the coupons log
+            if self.journal:
+                self.journal.clear()
 
-        with open(self.credentials_file, "w+") as file:
-            json.dump(self.user_credentials, file)
+        # Only rewrite the credentials file if they were changed,
+        # several account libraries may be open at the same time
+        if self.credentials_changed:
+            with open(self.credentials_file, "w+") as file:
+                json.dump(self.user_credentials, file)
+
+            self.credentials_changed = False
 
     def filter_coupons(self, coupons: list) -> list:
         """ 
-        Filters out any coupons that have already been added to the coupons log
+        Filters out any coupons that have already been added to the coupons log,
+        that another account found to be invalid, or that belong to another region
 
         :param coupons: List with coupons to filter
         :returns: List with coupons that are not already in the coupons log
         """
 
-        new_coupons = list()
+        with METRICS.time(stage="filter"):
+            # Keep the coupons of the library region, and the ones without region
+            coupons = [coupon for coupon in coupons
+                       if not coupon.region or coupon.region == self.region]
+
+            codes = [coupon.code for coupon in coupons]
 
-        for coupon in coupons:
-            if coupon not in self.log.keys():
-                new_coupons.append(coupon)
+            # Look up every coupon at once
+            logged_coupons = self.storage.get_many(coupons=codes)
 
-        return new_coupons
+            if self.outcomes:
+                logged_coupons.update(
+                    self.outcomes.get_many(coupons=codes, region=self.region))
+
+            return [coupon for coupon in coupons if coupon.code not in logged_coupons]
 
     def add_coupons(self, coupons: dict) -> None:
         """
@@ -73,7 +165,11 @@ class Library:
         :returns: None
         """
 
-        self.log.update(coupons)
+        self.storage.add(coupons=coupons)
+
+        # Share the outcomes that apply to every account
+        if self.outcomes:
+            self.outcomes.add(coupons=coupons, region=self.region)
 
     def get_user_credentials(self) -> dict:
         """ 
@@ -82,11 +178,66 @@ class Library:
         :returns: List with the user credentials
         """
 
-        steam_username, steam_password, steam_pp = list(
-            self.user_credentials["steam"].values())
+        return self.validate_credentials(credentials=self.user_credentials)
+
+    def get_accounts(self) -> dict:
+        """
+        Returns the credentials of every account in the user_credentials attribute,
+        the accounts listed under the "accounts" key are named after their
+        "name" field, or their Steam username or Pearl Abyss email
+
+        :returns: Dictionary with the account names and their user credentials
+        """
+
+        # If no account list was provided,
+        # use the single account credentials
+        if not self.user_credentials.get("accounts"):
+            return {self.DEFAULT_ACCOUNT: self.get_user_credentials()}
+
+        accounts = dict()
+
+        for credentials in self.user_credentials["accounts"]:
+            account_credentials = self.validate_credentials(
+                credentials=credentials)
+
+            account = credentials.get("name") or \
+                list(account_credentials.values())[0][0]
+
+            if account in accounts:
+                raise Exception(f"Duplicate account {account}.")
 
-        pearl_abyss_email, pearl_abyss_password = list(
-            self.user_credentials["pearl_abyss"].values())
+            accounts[account] = account_credentials
+
+        return accounts
+
+    def validate_credentials(self, credentials: dict) -> dict:
+        """
+        Validates the credentials of a single account
+
+        :param credentials: Dictionary with the Steam and Pearl Abyss credentials,
+        and the optional list of regions to redeem the coupons on
+        :returns: Dictionary with the credentials of the account provider to use
+        and the regions of the account
+        """
+
+        regions = [Coupon.normalize_region(region=region)
+                   for region in credentials.get("regions") or [self.DEFAULT_REGION]]
+
+        # If a region has no known shop,
+        # raise an exception
+        for region in regions:
+            if region not in Coupon.COUPON_REDEEM_PAGES:
+                raise Exception(f"Unknown region {region}.")
+
+        steam_credentials = credentials.get("steam", dict())
+        steam_username = steam_credentials.get("username")
+        steam_password = steam_credentials.get("password")
+        steam_pp = steam_credentials.get("pp_pin")
+        steam_shared_secret = steam_credentials.get("shared_secret")
+
+        pearl_abyss_credentials = credentials.get("pearl_abyss", dict())
+        pearl_abyss_email = pearl_abyss_credentials.get("email")
+        pearl_abyss_password = pearl_abyss_credentials.get("password")
 
         email_pattern = re.compile(
             r"^[a-z0-9]+[\._]?[a-z0-9]+[@]\w+[.]\w{2,3}$")
@@ -97,14 +248,20 @@ class Library:
                 if len(steam_pp) != 4:
                     raise Exception("Invalid parental protection pin.")
 
-            return {"steam": [steam_username, steam_password, steam_pp]}
+            # Raises an exception if the shared secret is not valid
+            if steam_shared_secret:
+                SteamGuard(shared_secret=steam_shared_secret)
+
+            return {"steam": [steam_username, steam_password, steam_pp, steam_shared_secret],
+                    "regions": regions}
 
         elif pearl_abyss_email and pearl_abyss_password:
 
             if not re.match(email_pattern, pearl_abyss_email):
                 raise Exception("Invalid email address.")
 
-            return {"pearl_abyss": [pearl_abyss_email, pearl_abyss_password]}
+            return {"pearl_abyss": [pearl_abyss_email, pearl_abyss_password],
+                    "regions": regions}
 
         else:
             raise Exception("No valid credentials provided.")
@@ -118,3 +275,4 @@ class Library:
         """
 
         self.user_credentials.update(user_credentials)
+        self.credentials_changed = True
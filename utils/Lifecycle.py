@@ -0,0 +1,284 @@
+import contextlib
+import logging
+import threading
+import time
+
+
+class Lifecycle:
+    """ Keeps the browser of each account alive between runs, recycling the ones
+    that grew too old, too large or stopped responding """
+
+    # Number of seconds a browser has to answer a health check, or to close
+    HEALTH_TIMEOUT = 10
+    QUIT_TIMEOUT = 15
+
+    MEGABYTE = 1024 * 1024
+
+    def __init__(self, max_coupons: int = None, max_age: float = None,
+                 max_memory: float = None, host_memory: float = None):
+        """
+        Initializes a new instance of the Lifecycle class
+
+        :param max_coupons: Number of coupons submitted after which a browser is recycled
+        :param max_age: Number of seconds after which a browser is recycled
+        :param max_memory: Number of megabytes of resident memory above which
+        a browser is recycled
+        :param host_memory: Number of megabytes of resident memory every browser
+        together may use, no new browser is started above it
+        """
+
+        self.max_coupons = max_coupons
+        self.max_age = max_age
+        self.max_memory = max_memory
+        self.host_memory = host_memory
+
+        # Browsers kept between the runs of their account, and the ones in use
+        self.condition = threading.Condition()
+        self.idle = dict()
+        self.active = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the browsers kept between runs
+
+        :returns: None
+        """
+
+        with self.condition:
+            bots = list(self.idle.values())
+            self.idle.clear()
+
+        for bot in bots:
+            self.discard(bot=bot)
+
+    @contextlib.contextmanager
+    def lease(self, account: str, create):
+        """
+        Lends the kept browser of an account, or a new one, keeping it afterwards
+        if it is still usable
+
+        :param account: Name of the account
+        :param create: Function returning a new bot, started if no usable bot is kept
+        :returns: Context manager of the bot
+        """
+
+        bot = self.acquire(account=account, create=create)
+
+        try:
+            yield bot
+
+        # If the run failed, the browser may be the cause,
+        # recycle it
+        except BaseException:
+            self.release(account=account, bot=bot, failed=True)
+            raise
+
+        self.release(account=account, bot=bot)
+
+    def acquire(self, account: str, create):
+        """
+        Takes the kept browser of an account if it passes its checks,
+        otherwise starts a new one once the host memory allows it
+
+        :param account: Name of the account
+        :param create: Function returning a new bot
+        :returns: Bot instance
+        """
+
+        with self.condition:
+            bot = self.idle.pop(account, None)
+
+        if bot:
+            reason = self.get_recycle_reason(bot=bot) or \
+                (None if self.is_healthy(bot=bot) else "it stopped responding")
+
+            if reason:
+                logging.info(f"[{account}] Recycling browser, {reason}.")
+                self.discard(bot=bot)
+                bot = None
+
+        if not bot:
+            self.wait_memory(account=account)
+            bot = create()
+
+        with self.condition:
+            self.active.append(bot)
+
+        return bot
+
+    def release(self, account: str, bot, failed: bool = False) -> None:
+        """
+        Keeps the browser of an account for its next run, unless it is due to be recycled
+
+        :param account: Name of the account
+        :param bot: Bot instance
+        :param failed: Whether the run of the account failed
+        :returns: None
+        """
+
+        with self.condition:
+            if bot in self.active:
+                self.active.remove(bot)
+
+        reason = "its run failed" if failed else self.get_recycle_reason(bot=bot)
+
+        # Leave room for the browsers in use
+        if not reason and self.host_memory and \
+                self.get_memory() + bot.driver.get_memory() > self.host_memory * self.MEGABYTE:
+            reason = "the host memory limit was reached"
+
+        if reason:
+            logging.info(f"[{account}] Recycling browser, {reason}.")
+            self.discard(bot=bot)
+
+        else:
+            with self.condition:
+                previous = self.idle.pop(account, None)
+                self.idle[account] = bot
+
+            if previous:
+                self.discard(bot=previous)
+
+        with self.condition:
+            self.condition.notify_all()
+
+    def get_recycle_reason(self, bot) -> str:
+        """
+        Checks the coupons submitted, the age and the memory of a browser against the limits
+
+        :param bot: Bot instance
+        :returns: String with the reason to recycle the browser, or None if it is still usable
+        """
+
+        if self.max_coupons and bot.coupon_count >= self.max_coupons:
+            return f"it submitted {bot.coupon_count} coupons"
+
+        if self.max_age and time.monotonic() - bot.start_time >= self.max_age:
+            return f"it is older than {self.max_age} seconds"
+
+        if self.max_memory:
+            memory = bot.driver.get_memory() / self.MEGABYTE
+
+            if memory > self.max_memory:
+                return f"it uses {memory:.0f} MB"
+
+        return None
+
+    def is_healthy(self, bot) -> bool:
+        """
+        Checks that the browser still answers a command in time,
+        a hung driver never does
+
+        :param bot: Bot instance
+        :returns: True if the browser answered
+        """
+
+        answers = list()
+
+        def check():
+            """
+            Helper function that runs a trivial script in the browser
+
+            :return: None
+            """
+
+            try:
+                answers.append(bot.driver.execute_script("return 1;"))
+
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=check, daemon=True)
+        thread.start()
+        thread.join(timeout=self.HEALTH_TIMEOUT)
+
+        return answers == [1]
+
+    def discard(self, bot) -> None:
+        """
+        Closes a browser, killing its processes if it does not close in time
+
+        :param bot: Bot instance
+        :returns: None
+        """
+
+        # The processes may no longer be found once the driver is gone
+        process_ids = bot.driver.get_process_ids()
+
+        closed = list()
+
+        def close():
+            """
+            Helper function that closes the bot
+
+            :return: None
+            """
+
+            try:
+                bot.__exit__(None, None, None)
+                closed.append(True)
+
+            except Exception as e:
+                logging.warning(f"Failed to close browser. {e}")
+
+        thread = threading.Thread(target=close, daemon=True)
+        thread.start()
+        thread.join(timeout=self.QUIT_TIMEOUT)
+
+        # If the browser did not close, like with a hung driver,
+        # kill its processes
+        if not closed:
+            bot.driver.kill(process_ids=process_ids)
+
+    def get_memory(self) -> int:
+        """
+        Returns the resident memory of every kept and used browser together
+
+        :returns: Number of bytes
+        """
+
+        with self.condition:
+            bots = list(self.idle.values()) + self.active
+
+        return sum(bot.driver.get_memory() for bot in bots)
+
+    def wait_memory(self, account: str) -> None:
+        """
+        Makes room for a new browser under the host memory limit, closing the browsers
+        kept for other accounts first, then waiting for the ones in use to be released
+
+        :param account: Name of the account the browser is for
+        :returns: None
+        """
+
+        if not self.host_memory:
+            return
+
+        while self.get_memory() >= self.host_memory * self.MEGABYTE:
+            with self.condition:
+                # Close the largest kept browser first
+                kept = max(self.idle.items(), default=None,
+                           key=lambda item: item[1].driver.get_memory())
+
+                if kept:
+                    del self.idle[kept[0]]
+
+                # If no browser is in use either,
+                # the limit cannot be met, start the browser anyway
+                elif not self.active:
+                    return
+
+                else:
+                    logging.info(
+                        f"[{account}] Waiting for browser memory below the host limit...")
+                    self.condition.wait(timeout=self.HEALTH_TIMEOUT)
+                    continue
+
+            logging.info(f"[{kept[0]}] Closing kept browser, the host memory limit was reached.")
+            self.discard(bot=kept[1])
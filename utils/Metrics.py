@@ -0,0 +1,244 @@
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+from utils.Tracer import TRACER
+
+
+class Steps:
+    """ Times the consecutive steps of a stage, like the steps of a login """
+
+    def __init__(self, metrics, prefix: str):
+        """
+        Initializes a new instance of the Steps class
+
+        :param metrics: Metrics the step latencies are recorded in
+        :param prefix: Prefix of the stage name of every step
+        """
+
+        self.metrics = metrics
+        self.prefix = prefix
+        self.step = None
+        self.start_time = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.end(result="error" if exc_type else "ok")
+
+    def end(self, result: str = "ok") -> None:
+        """
+        Records the latency of the current step, if any
+
+        :param result: Result of the step, either "ok" or "error"
+        :returns: None
+        """
+
+        if self.step:
+            end_time = time.perf_counter()
+
+            self.metrics.observe(
+                stage=f"{self.prefix}_{self.step}",
+                seconds=end_time - self.start_time, result=result)
+
+            # Also put the step on the timeline of the run
+            if TRACER.enabled:
+                TRACER.add(name=f"{self.prefix}_{self.step}", category="stage",
+                           start_time=self.start_time, end_time=end_time,
+                           args={"result": result})
+
+        self.step = None
+
+    def start(self, step: str) -> None:
+        """
+        Records the latency of the current step and starts timing the next one
+
+        :param step: Name of the next step
+        :returns: None
+        """
+
+        self.end()
+
+        self.step = step
+        self.start_time = time.perf_counter()
+
+
+class Metrics:
+    """ Records latency histograms and counters, exported in the Prometheus text format """
+
+    PREFIX = "couponwizard"
+
+    # Upper bounds of the latency histogram buckets, in seconds
+    BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60]
+
+    def __init__(self):
+        """
+        Initializes a new instance of the Metrics class
+        """
+
+        # Recorded from the worker threads
+        self.lock = threading.Lock()
+
+        self.histograms = dict()
+        self.counters = dict()
+
+    def observe(self, stage: str, seconds: float, result: str = "ok") -> None:
+        """
+        Records the latency of a stage
+
+        :param stage: Name of the stage
+        :param seconds: Number of seconds the stage took
+        :param result: Result of the stage, either "ok" or "error"
+        :returns: None
+        """
+
+        with self.lock:
+            histogram = self.histograms.setdefault(
+                (stage, result), {"buckets": [0] * len(self.BUCKETS), "sum": 0, "count": 0})
+
+            bucket = bisect.bisect_left(self.BUCKETS, seconds)
+            if bucket < len(self.BUCKETS):
+                histogram["buckets"][bucket] += 1
+
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    @contextlib.contextmanager
+    def time(self, stage: str):
+        """
+        Records the latency of the wrapped block, as an error if it raised an exception,
+        and puts it on the timeline of the run while tracing
+
+        :param stage: Name of the stage
+        :returns: Context manager timing the block
+        """
+
+        start_time = time.perf_counter()
+        result = "error"
+
+        try:
+            with TRACER.span(name=stage):
+                yield
+                result = "ok"
+
+        finally:
+            self.observe(stage=stage, seconds=time.perf_counter() - start_time,
+                         result=result)
+
+    def steps(self, prefix: str) -> Steps:
+        """
+        Returns a timer of the consecutive steps of a stage
+
+        :param prefix: Prefix of the stage name of every step
+        :returns: Steps instance, to use as a context manager
+        """
+
+        return Steps(metrics=self, prefix=prefix)
+
+    def count(self, status: str) -> None:
+        """
+        Counts a coupon outcome
+
+        :param status: Status of the coupon, like "Success" or "Rate Limited"
+        :returns: None
+        """
+
+        with self.lock:
+            self.counters[status] = self.counters.get(status, 0) + 1
+
+    def render(self) -> str:
+        """
+        Renders the recorded metrics in the Prometheus text format
+
+        :returns: String with the metrics
+        """
+
+        lines = [
+            f"# HELP {self.PREFIX}_stage_seconds Latency of each stage.",
+            f"# TYPE {self.PREFIX}_stage_seconds histogram"
+        ]
+
+        with self.lock:
+            for (stage, result), histogram in sorted(self.histograms.items()):
+                labels = f'stage="{stage}",result="{result}"'
+
+                # The buckets of the Prometheus format are cumulative
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(
+                        f'{self.PREFIX}_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+
+                lines.append(
+                    f'{self.PREFIX}_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+                lines.append(
+                    f"{self.PREFIX}_stage_seconds_sum{{{labels}}} {histogram['sum']:.6f}")
+                lines.append(
+                    f"{self.PREFIX}_stage_seconds_count{{{labels}}} {histogram['count']}")
+
+            lines.append(
+                f"# HELP {self.PREFIX}_coupons_total Coupons submitted, by outcome.")
+            lines.append(f"# TYPE {self.PREFIX}_coupons_total counter")
+
+            for status, count in sorted(self.counters.items()):
+                lines.append(
+                    f'{self.PREFIX}_coupons_total{{status="{status}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, file_name: str) -> None:
+        """
+        Writes the recorded metrics to a file, for the node exporter textfile collector
+
+        :param file_name: Name of the metrics file
+        :returns: None
+        """
+
+        # Replace the file at once, so that it is never read half written
+        temporary_file = f"{file_name}.tmp"
+
+        with open(temporary_file, "w+") as file:
+            file.write(self.render())
+
+        os.replace(temporary_file, file_name)
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """
+        Serves the recorded metrics over HTTP in the background
+
+        :param port: Port of the metrics endpoint
+        :param host: Address the metrics endpoint listens on
+        :returns: HTTP server of the metrics endpoint
+        """
+
+        # Only import the HTTP server once the endpoint is enabled
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                body = metrics.render().encode()
+
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        return server
+
+
+# Shared by every module of the process
+METRICS = Metrics()
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+
+
+class Outcomes:
+    """ A cache of the coupon outcomes shared by every account, per region """
+
+    OUTCOMES_FILE = "outcomes.json"
+
+    # Outcomes that apply to every account,
+    # the other outcomes stay in the log of each account
+    SHARED_STATUSES = ["Invalid"]
+
+    def __init__(self, ttl: float = 24 * 60 * 60):
+        """
+        Initializes a new instance of the Outcomes class
+
+        :param ttl: Number of seconds a shared outcome is trusted
+        """
+
+        self.ttl = ttl
+        self.outcomes = self.load_file()
+        self.changed = False
+
+        # The cache is shared by the workers of every account
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.update_file()
+
+    def load_file(self) -> dict:
+        """
+        Loads the outcomes file, or returns an empty dictionary
+
+        :returns: Dictionary with the region and coupon code keys and their outcome
+        """
+
+        try:
+            with open(self.OUTCOMES_FILE) as file:
+                return json.load(file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
+
+    def update_file(self) -> None:
+        """
+        Writes the outcomes file if any outcome was added,
+        merging the outcomes added by other processes and dropping the expired ones
+
+        :returns: None
+        """
+
+        with self.lock:
+            if not self.changed:
+                return
+
+            outcomes = self.load_file()
+            outcomes.update(self.outcomes)
+
+            now = time.time()
+            self.outcomes = {coupon: outcome for coupon, outcome in outcomes.items()
+                             if now - outcome["time"] < self.ttl}
+
+            # Replace the file at once, other processes may be reading it
+            with open(f"{self.OUTCOMES_FILE}.tmp", "w+") as file:
+                json.dump(self.outcomes, file)
+
+            os.replace(f"{self.OUTCOMES_FILE}.tmp", self.OUTCOMES_FILE)
+
+            self.changed = False
+
+    @staticmethod
+    def get_key(coupon: str, region: str) -> str:
+        """
+        Returns the key of the outcome of a coupon on a region,
+        a coupon invalid on a region may still be valid on another one
+
+        :param coupon: The coupon code
+        :param region: Region the coupon was redeemed on
+        :returns: String with the key of the outcome
+        """
+
+        return f"{region}/{coupon}"
+
+    def get_many(self, coupons: list, region: str) -> dict:
+        """
+        Looks up the shared outcomes of several coupons of a region at once
+
+        :param coupons: List with the coupon codes to look up
+        :param region: Region the coupons are redeemed on
+        :returns: Dictionary with the coupon codes that have a trusted outcome and their status
+        """
+
+        now = time.time()
+        outcomes = dict()
+
+        with self.lock:
+            for coupon in coupons:
+                outcome = self.outcomes.get(self.get_key(coupon=coupon, region=region))
+
+                if outcome and now - outcome["time"] < self.ttl:
+                    outcomes[coupon] = outcome["status"]
+
+        return outcomes
+
+    def add(self, coupons: dict, region: str) -> None:
+        """
+        Records the outcomes of the given coupons of a region that apply to every account
+
+        :param coupons: Dictionary with the coupon codes and their status
+        :param region: Region the coupons were redeemed on
+        :returns: None
+        """
+
+        now = time.time()
+
+        with self.lock:
+            for coupon, status in coupons.items():
+                if status in self.SHARED_STATUSES:
+                    self.outcomes[self.get_key(coupon=coupon, region=region)] = {
+                        "status": status, "time": now}
+                    self.changed = True
@@ -0,0 +1,91 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.Launcher import Launcher
+from utils.Worker import Worker
+
+
+class Pool:
+    """ Runs the workers of several accounts concurrently """
+
+    def __init__(self, workers: int = 1, **options):
+        """
+        Initializes a new instance of the Pool class
+
+        :param workers: Maximum number of accounts, and browsers, running at the same time
+        :param options: Keyword arguments passed on to every worker
+        """
+
+        self.options = options
+
+        if workers < 1:
+            raise Exception("The number of workers must be at least 1.")
+
+        # Each worker drives its own Chrome process,
+        # so threads are enough to run them concurrently
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="Worker")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def run(self, accounts: dict, coupons: list, libraries: dict = None,
+            launcher: Launcher = None) -> dict:
+        """
+        Redeems the coupons on every account, with at most the pool size running at once
+
+        :param accounts: Dictionary with the account names and their user credentials
+        :param coupons: List with the active coupons
+        :param libraries: Dictionary with the account names and the loaded libraries
+        of each of their regions, each account loads its own libraries if not provided
+        :param launcher: Launcher with bots started in the background for the accounts
+        :returns: Dictionary with the account names and their results, each result
+        holds the coupons log of each region of the account and the error that stopped it,
+        if any
+        """
+
+        libraries = libraries or dict()
+
+        futures = {
+            self.executor.submit(
+                Worker(account, user_credentials, **self.options).run,
+                coupons, libraries.get(account), launcher): account
+            for account, user_credentials in accounts.items()}
+
+        results = dict()
+
+        for future in as_completed(futures):
+            account = futures[future]
+
+            try:
+                results[account] = {"coupons": future.result(), "error": None}
+
+            # If the account run failed,
+            # report the error without stopping the other accounts
+            except Exception as e:
+                logging.error(f"[{account}] {e}")
+                results[account] = {"coupons": dict(), "error": str(e)}
+
+        return results
+
+    def report(self, results: dict) -> None:
+        """
+        Logs the ratio of coupons redeemed per account
+
+        :param results: Dictionary with the account names and their results
+        :returns: None
+        """
+
+        for account, result in results.items():
+            if result["error"]:
+                logging.info(f"[{account}] Failed. {result['error']}")
+                continue
+
+            for region, coupons_log in result["coupons"].items():
+                success_count = list(coupons_log.values()).count("Success")
+                logging.info(
+                    f"[{account}] Successfully redeemed {success_count}/{len(coupons_log)} "
+                    f"coupons on {region}.")
@@ -0,0 +1,91 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.Metrics import METRICS
+from utils.Scheduler import RateLimitError
+
+
+class Redeemer:
+    """ Submits coupons to the BlackDesert website with plain HTTP requests """
+
+    CONFIRMATION_PAGE = "WebItemStorage/Complete"
+    TIMEOUT = 15
+
+    def __init__(self, cookies: list, user_agent: str, coupon_form: dict, submit_dialog: dict):
+        """
+        Initializes a new instance of the Redeemer class
+
+        :param cookies: List with the cookies of a logged in browser
+        :param user_agent: User agent of the logged in browser
+        :param coupon_form: Dictionary with the structure of the coupon form
+        :param submit_dialog: Dictionary with the coupon status and their messages
+        """
+
+        if not coupon_form or not all(coupon_form["inputs"]):
+            raise Exception("Coupon form not supported.")
+
+        self.coupon_form = coupon_form
+        self.submit_dialog = submit_dialog
+
+        # Keep the connections alive between coupons
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=4))
+        self.session.headers.update({"User-Agent": user_agent})
+
+        # Move the browser cookies to the session
+        for cookie in cookies:
+            self.session.cookies.set(
+                name=cookie["name"], value=cookie["value"],
+                domain=cookie["domain"], path=cookie.get("path", "/"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.session.close()
+
+    def redeem_coupon(self, coupon: str) -> dict:
+        """
+        Redeem a coupon code and returns a dictionary with the coupon code and status
+
+        :param coupon: The coupon code to redeem
+        :return: A dictionary with the coupon code and its status
+        """
+
+        coupon_slices = coupon.split("-")
+
+        if len(coupon_slices) != len(self.coupon_form["inputs"]):
+            raise Exception("Coupon code does not match the coupon form.")
+
+        # Fill in the coupon code along with the hidden fields of the form,
+        # which hold the anti-forgery token
+        data = dict(self.coupon_form["fields"])
+        data.update(zip(self.coupon_form["inputs"], coupon_slices))
+
+        with METRICS.time(stage="http_submit"):
+            response = self.session.request(
+                method=self.coupon_form["method"], url=self.coupon_form["action"],
+                data=data, timeout=self.TIMEOUT)
+
+        # If the redeem attempts were exceeded,
+        # raise an exception
+        if response.status_code == 429:
+            raise RateLimitError("Exceded maximum redeem attempts.")
+
+        response.raise_for_status()
+
+        # If the response redirected to the confirmation page,
+        # the coupon was redeemed
+        if self.CONFIRMATION_PAGE in response.url:
+            return {coupon: "Success"}
+
+        # Check for the status of the coupon redeem
+        statuses = [status for status, message in self.submit_dialog.items()
+                    if message in response.text]
+
+        # If no status, or more than one, was found,
+        # like on a page embedding every message, raise an exception
+        if len(statuses) != 1:
+            raise Exception("Unexpected coupon redeem response.")
+
+        return {coupon: statuses[0]}
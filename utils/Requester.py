@@ -1,41 +1,505 @@
-import requests
+import codecs
+import hashlib
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.Coupon import Coupon
+from utils.Metrics import METRICS
+from utils.Tracer import TRACER
 
 
 class Requester:
-    """ Requests active coupons from the Garmoth API """
+    """ Requests active coupons from the Garmoth API and other coupon sources """
 
     API = "https://garmoth.com/api/coupons"
     HEADERS = {"User-Agent": "CouponWizard"}
+    TIMEOUT = 15
+
+    SOURCES_FILE = "coupon_sources.json"
+    CACHE_FILE = "coupons_cache.json"
+
+    COUPON_PATTERN = re.compile(r"\b[A-Z0-9]{4}(?:-[A-Z0-9]{4}){3}\b")
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, sources: list = None, cache_ttl: float = 0, region: str = None):
+        """
+        Initializes a new instance of the Requester class
+
+        :param sources: List with the coupon sources, each with a "name", an "url",
+        a "format", either "garmoth" or "text", and an optional "timeout",
+        loaded from the sources file if not provided
+        :param cache_ttl: Number of seconds a cached response is reused
+        without requesting its source again
+        :param region: Region of the coupons to keep, the coupons of
+        any region are kept if not provided
+        """
+
+        self.sources = sources or self.load_sources()
+        self.cache_ttl = cache_ttl
+        self.region = Coupon.normalize_region(region=region)
+
+        # The session is only created once a source needs to be requested
+        self.session = None
+
+        # Cached coupons and validators of the last response of each source
+        self.cache = self.load_cache()
+        self.cache_changed = False
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        pass
+        if self.session:
+            self.session.close()
+
+        if self.cache_changed:
+            with open(self.CACHE_FILE, "w+") as file:
+                json.dump(self.cache, file)
+
+    def get_session(self):
+        """
+        Returns the session shared by the sources, creating it on first use,
+        so that runs answered from the cache never import requests
+
+        :returns: Session with a pool of kept alive connections
+        """
+
+        if not self.session:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self.session = requests.Session()
+            self.session.headers.update(self.HEADERS)
+            adapter = HTTPAdapter(
+                pool_connections=len(self.sources), pool_maxsize=len(self.sources))
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+        return self.session
+
+    def is_cached(self, source: dict) -> bool:
+        """
+        Checks if the cached response of a source is within the cache TTL
+
+        :param source: Dictionary with the source settings
+        :returns: True if the cached response can be reused without a request
+        """
+
+        cached = self.cache.get(source["name"])
+
+        return bool(cached) and time.time() - cached["time"] < self.cache_ttl
+
+    def is_failed(self, source: dict) -> bool:
+        """
+        Checks if the last request of a source failed
+
+        :param source: Dictionary with the source settings
+        :returns: True if the cached entry of the source records a failure
+        """
+
+        return bool(self.cache.get(source["name"], dict()).get("failed"))
+
+    def load_sources(self) -> list:
+        """
+        Loads the coupon sources from the sources file,
+        or returns the Garmoth API if the file does not exist
+
+        :returns: List with the coupon sources
+        """
+
+        try:
+            with open(self.SOURCES_FILE) as file:
+                return json.load(file)
+
+        except FileNotFoundError:
+            return [{"name": "garmoth", "url": self.API, "format": "garmoth"}]
 
-    def parse_coupons(self, response: dict) -> list:
+    def load_cache(self) -> dict:
+        """
+        Loads the cached responses of the sources
+
+        :returns: Dictionary with the source names and their cached response
+        """
+
+        try:
+            with open(self.CACHE_FILE) as file:
+                return json.load(file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
+
+    def read_chunks(self, response, digest, deadline: float = None):
+        """
+        Reads the body of a streamed response in chunks, hashing it along the way
+
+        :param response: Streamed response from the source
+        :param digest: Hash object updated with every chunk
+        :param deadline: Monotonic time by which the whole body must be read,
+        no deadline if not provided
+        :returns: Generator of the body chunks
+        """
+
+        for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+            # The request timeout only limits each read,
+            # stop a source that keeps trickling data
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError("The source did not respond in time.")
+
+            digest.update(chunk)
+            yield chunk
+
+    def parse_json_array(self, chunks) -> list:
+        """
+        Parses a JSON array one entry at a time, as its chunks arrive,
+        without holding the whole response in memory
+
+        :param chunks: Iterable with the chunks of the JSON array
+        :returns: Generator of the entries of the JSON array
+        """
+
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        buffer = ""
+        started = False
+
+        for chunk in chunks:
+            buffer += text_decoder.decode(chunk)
+
+            while True:
+                buffer = buffer.lstrip()
+
+                if not buffer:
+                    break
+
+                # Skip the opening bracket of the array
+                if not started:
+                    if buffer[0] != "[":
+                        raise Exception("Unexpected coupons response.")
+
+                    buffer = buffer[1:]
+                    started = True
+                    continue
+
+                buffer = buffer.lstrip(", \t\r\n")
+
+                if not buffer:
+                    break
+
+                if buffer[0] == "]":
+                    return
+
+                try:
+                    entry, end = decoder.raw_decode(buffer)
+
+                # If the entry is incomplete,
+                # wait for the next chunk
+                except json.JSONDecodeError:
+                    break
+
+                yield entry
+                buffer = buffer[end:]
+
+        raise Exception("Incomplete coupons response.")
+
+    def parse_coupons(self, chunks, format: str = "garmoth", source: str = None) -> list:
         """ 
-        Retrieves coupon codes from the JSON response
+        Retrieves coupons and their metadata from the response of a source
 
-        :param response: JSON response from the API
-        :returns: List with coupon codes
+        :param chunks: Iterable with the chunks of the response body
+        :param format: Format of the response, either "garmoth",
+        a JSON list of coupons, or "text", scanned for coupon codes
+        :param source: Name of the source
+        :returns: List with coupons
         """
 
+        if format == "text":
+            text = b"".join(chunks).decode("utf-8", errors="replace")
+
+            return [Coupon(code=code, source=source)
+                    for code in self.COUPON_PATTERN.findall(text.upper())]
+
         coupons = list()
 
-        for coupon in response:
-            coupons.append(coupon["code"])
+        for entry in self.parse_json_array(chunks=chunks):
+            coupons.append(Coupon.from_entry(entry=entry, source=source))
+
+        # Read the rest of the body, to hash it entirely
+        for _ in chunks:
+            pass
 
         return coupons
 
-    def request_coupons(self) -> list:
+    def normalize_coupons(self, coupons: list) -> list:
+        """
+        Normalizes the coupon codes and removes the duplicates
+
+        :param coupons: List with coupons from every source
+        :returns: List with the unique coupons, in their first seen order
+        """
+
+        normalized_coupons = dict()
+
+        for coupon in coupons:
+            # The cached coupons are stored as lists
+            coupon = Coupon(*coupon) if not isinstance(coupon, str) \
+                else Coupon(code=coupon)
+
+            # Uppercase the code and replace any whitespace
+            # or dash variant between its segments with a dash
+            code = re.sub(r"[\s\u2010-\u2015-]+", "-",
+                          coupon.code.strip().upper()).strip("-")
+
+            normalized_coupons.setdefault(code, coupon._replace(code=code))
+
+        return list(normalized_coupons.values())
+
+    def screen_coupons(self, coupons: list) -> list:
+        """
+        Drops the malformed, expired and other region coupons,
+        and orders the remaining ones by the soonest expiry first
+
+        :param coupons: List with coupons
+        :returns: List with the coupons worth redeeming
+        """
+
+        now = time.time()
+        screened_coupons = list()
+
+        for coupon in coupons:
+            if not coupon.is_valid():
+                logging.debug(f"Dropped malformed coupon {coupon.code}.")
+
+            elif coupon.expiry and coupon.expiry <= now:
+                logging.debug(f"Dropped expired coupon {coupon.code}.")
+
+            elif self.region and coupon.region and coupon.region != self.region:
+                logging.debug(f"Dropped {coupon.region} coupon {coupon.code}.")
+
+            else:
+                screened_coupons.append(coupon)
+
+        # Coupons without expiry go last
+        return sorted(screened_coupons, key=lambda coupon: (
+            coupon.expiry is None, coupon.expiry or 0))
+
+    def fetch_source(self, source: dict, use_cache: bool = True, on_change=None) -> tuple:
+        """
+        Requests the coupons of a source with a conditional GET request,
+        unless its cached response is within the cache TTL
+
+        :param source: Dictionary with the source settings
+        :param use_cache: Reuse the cached response if it is within the cache TTL
+        :param on_change: Function called as soon as the source responds
+        with a changed response
+        :returns: Tuple with the list of coupons of the source
+        and whether they changed since the cached response
+        """
+
+        cached = self.cache.get(source["name"], dict())
+
+        # If the cached response is recent enough,
+        # skip the request
+        if use_cache and self.is_cached(source=source):
+
+            # If the source failed within the cache TTL,
+            # do not request it again
+            if cached.get("failed"):
+                raise Exception("The source failed recently, it is retried after the cache TTL.")
+
+            return cached["coupons"], False
+
+        try:
+            return self.request_source(source=source, cached=cached, on_change=on_change)
+
+        # Remember the failure for the cache TTL, keeping the validators
+        # and coupons of the last response
+        except Exception:
+            self.cache[source["name"]] = {
+                **cached, "time": time.time(), "failed": True,
+                "coupons": cached.get("coupons", list())}
+            self.cache_changed = True
+            raise
+
+    def request_source(self, source: dict, cached: dict, on_change=None) -> tuple:
+        """
+        Requests the coupons of a source with a conditional GET request,
+        within the source timeout
+
+        :param source: Dictionary with the source settings
+        :param cached: Dictionary with the cached response of the source, if any
+        :param on_change: Function called as soon as the source responds
+        with a changed response
+        :returns: Tuple with the list of coupons of the source
+        and whether they changed since the cached response
+        """
+
+        timeout = source.get("timeout", self.TIMEOUT)
+        deadline = time.monotonic() + timeout
+
+        headers = dict()
+
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        with TRACER.span(name="fetch_source", source=source["name"]), self.get_session().get(
+                url=source["url"], headers=headers, stream=True,
+                timeout=timeout) as response:
+            response.raise_for_status()
+
+            # If the source confirmed that nothing changed,
+            # reuse the cached coupons
+            if response.status_code == 304:
+                cached["time"] = time.time()
+                cached.pop("failed", None)
+                self.cache_changed = True
+                return cached["coupons"], False
+
+            digest = hashlib.sha1()
+            chunks = self.read_chunks(response=response, digest=digest, deadline=deadline)
+
+            # If the source does not support conditional requests,
+            # hash the whole body first, so that an unchanged body is never parsed
+            if not response.headers.get("ETag") and not response.headers.get("Last-Modified"):
+                chunks = list(chunks)
+
+                # If the response body is the same,
+                # keep the cached coupons
+                if digest.hexdigest() == cached.get("digest"):
+                    cached["time"] = time.time()
+                    cached.pop("failed", None)
+                    self.cache_changed = True
+                    return cached["coupons"], False
+
+            # Start the browser before the response is parsed
+            if on_change:
+                on_change()
+
+            # Parse the response as it is streamed,
+            # unless it was already read to be hashed
+            coupons = self.parse_coupons(
+                chunks=chunks, format=source.get("format", "garmoth"), source=source["name"])
+            digest = digest.hexdigest()
+
+        # If the source ignored its validators
+        # but the response body is the same, keep the cached coupons
+        if digest == cached.get("digest"):
+            cached["time"] = time.time()
+            cached.pop("failed", None)
+            self.cache_changed = True
+            return cached["coupons"], False
+
+        self.cache[source["name"]] = {
+            "time": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "digest": digest,
+            "coupons": coupons
+        }
+        self.cache_changed = True
+
+        return coupons, True
+
+    def fetch_sources(self, use_cache: bool = True, on_change=None) -> tuple:
+        """
+        Requests the coupons of every source at the same time,
+        a slow or failing source does not block the others
+
+        :param use_cache: Reuse the cached responses within the cache TTL
+        :param on_change: Function called as soon as any source responds
+        with a changed response
+        :returns: Tuple with the list of unique and screened coupons of every source
+        and whether any source changed since its cached response
+        """
+
+        # If every source is cached, including the failed ones,
+        # skip the threads entirely
+        if use_cache and all(self.is_cached(source=source) for source in self.sources):
+            sources = [source for source in self.sources if not self.is_failed(source=source)]
+
+            if not sources:
+                raise Exception("Every coupon source failed.")
+
+            return self.screen_coupons(coupons=self.normalize_coupons(coupons=[
+                coupon for source in sources
+                for coupon in self.cache[source["name"]]["coupons"]])), False
+
+        # Create the shared session before the threads use it
+        self.get_session()
+
+        coupons = list()
+        changed = False
+        errors = list()
+
+        executor = ThreadPoolExecutor(max_workers=len(self.sources))
+
+        futures = [
+            (source, executor.submit(self.fetch_source, source, use_cache, on_change))
+            for source in self.sources]
+
+        # Give every source its whole timeout from now,
+        # and a last read timeout to notice its deadline
+        deadline = time.monotonic() + 2 * max(
+            source.get("timeout", self.TIMEOUT) for source in self.sources)
+
+        for source, future in futures:
+            try:
+                source_coupons, source_changed = future.result(
+                    timeout=max(deadline - time.monotonic(), 0))
+                coupons.extend(source_coupons)
+                changed = changed or source_changed
+
+            # If the source failed or timed out,
+            # keep the coupons of the other sources
+            except Exception as e:
+                logging.warning(
+                    f"Failed to retrieve coupons from {source['name']}. "
+                    f"{str(e) or 'The source did not respond in time.'}")
+                errors.append(e)
+
+        # A source stuck past its deadline ends on its own,
+        # do not wait for it
+        executor.shutdown(wait=False)
+
+        # If every source failed,
+        # raise an exception
+        if len(errors) == len(self.sources):
+            raise Exception("Every coupon source failed.")
+
+        return self.screen_coupons(
+            coupons=self.normalize_coupons(coupons=coupons)), changed
+
+    def request_coupons(self, on_change=None) -> list:
         """ 
-        Sends a GET request to the API and returns a list with coupons
+        Requests the coupons of every source and returns a list with coupons
 
+        :param on_change: Function called as soon as any source responds
+        with a changed response
         :returns: List with coupons
         """
 
-        response = requests.get(url=self.API, headers=self.HEADERS)
-        response.raise_for_status()
+        with METRICS.time(stage="fetch"):
+            coupons, _ = self.fetch_sources(on_change=on_change)
+
+        return coupons
+
+    def poll_coupons(self, on_change=None) -> list:
+        """
+        Requests the coupons of every source and returns a list with coupons,
+        only if any source changed since the last poll
+
+        :param on_change: Function called as soon as any source responds
+        with a changed response
+        :returns: List with coupons, or None if no source changed
+        """
+
+        with METRICS.time(stage="fetch"):
+            coupons, changed = self.fetch_sources(
+                use_cache=False, on_change=on_change)
 
-        return self.parse_coupons(response=response.json())
+        return coupons if changed else None
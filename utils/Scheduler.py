@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from utils.Metrics import METRICS
+
+
+class RateLimitError(Exception):
+    """ Raised when the website rejects a coupon for exceeding the redeem attempts """
+
+
+class Scheduler:
+    """ Paces the coupon redeems with a token bucket that adapts to the website limit """
+
+    SCHEDULER_FILE = "scheduler.json"
+
+    # Keep the pace under the rate at which the limit was last hit
+    SAFETY_MARGIN = 0.9
+
+    def __init__(self, max_rate: float = 2, burst: int = 1, cooldown: float = 60,
+                 max_cooldowns: int = 5, stop: threading.Event = None):
+        """
+        Initializes a new instance of the Scheduler class
+
+        :param max_rate: Maximum number of coupons redeemed per second,
+        the coupons are redeemed without pacing if not provided, like in the benchmark
+        :param burst: Number of coupons that can be redeemed back to back
+        :param cooldown: Number of seconds to wait after hitting the limit,
+        doubled on each consecutive hit
+        :param max_cooldowns: Number of consecutive cooldowns before giving up
+        :param stop: Event that cuts a cooldown short, set to stop the run
+        """
+
+        self.max_rate = max_rate
+        self.paced = bool(max_rate)
+        self.burst = burst
+        self.cooldown = cooldown
+        self.max_cooldowns = max_cooldowns
+        self.stop = stop
+
+        # Start from the pace learned on the previous runs
+        state = self.load_file() if self.paced else dict()
+        self.limit_rate = state.get("limit_rate")
+        self.rate = min(state.get("rate", max_rate), self.get_ceiling()) if self.paced else None
+
+        self.tokens = burst
+        self.refill_time = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.redeemed = 0
+        self.cooldowns = 0
+        self.start_time = None
+
+    def load_file(self) -> dict:
+        """
+        Loads the pace learned on the previous runs
+
+        :returns: Dictionary with the learned rate and the rate at which the limit was hit
+        """
+
+        try:
+            with open(self.SCHEDULER_FILE) as file:
+                return json.load(file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
+
+    def update_file(self) -> None:
+        """
+        Saves the learned pace for the next runs
+
+        :returns: None
+        """
+
+        # Keep the pace learned by the paced runs
+        if not self.paced:
+            return
+
+        # Replace the file at once, the regions and accounts
+        # of other threads may be saving their pace too
+        temporary_file = f"{self.SCHEDULER_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(temporary_file, "w+") as file:
+            json.dump({"rate": self.rate, "limit_rate": self.limit_rate}, file)
+
+        os.replace(temporary_file, self.SCHEDULER_FILE)
+
+    def get_ceiling(self) -> float:
+        """
+        Returns the highest rate the scheduler may reach
+
+        :returns: Number of coupons per second
+        """
+
+        if self.limit_rate:
+            return min(self.max_rate, self.limit_rate * self.SAFETY_MARGIN)
+
+        return self.max_rate
+
+    def acquire(self) -> None:
+        """
+        Waits until the bucket has a token for the next coupon and takes it
+
+        :returns: None
+        """
+
+        if not self.paced:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.refill_time) * self.rate)
+            self.refill_time = now
+
+            delay = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            self.tokens -= 1
+
+        if delay:
+            time.sleep(delay)
+
+    def success(self) -> None:
+        """
+        Speeds up slowly after a coupon went through
+
+        :returns: None
+        """
+
+        self.redeemed += 1
+        self.cooldowns = 0
+
+        if self.paced:
+            self.rate = min(self.get_ceiling(), self.rate + 0.05)
+
+    def limited(self) -> float:
+        """
+        Slows down after hitting the limit and remembers the rate it was hit at
+
+        :returns: Number of seconds to cool down before resuming
+        """
+
+        METRICS.count(status="Rate Limited")
+
+        if self.paced:
+            self.limit_rate = self.rate
+            self.rate = max(self.rate / 2, 0.01)
+
+        self.cooldowns += 1
+
+        return self.cooldown * 2 ** (self.cooldowns - 1)
+
+    def run(self, coupons: list, redeem, skip=None):
+        """
+        Redeems the coupons at the learned pace, parking the remaining coupons
+        and resuming them after a cooldown whenever the limit is hit
+
+        :param coupons: List with the coupon codes to redeem
+        :param redeem: Function that redeems an iterable of coupon codes
+        and returns an iterable of dictionaries with each coupon code and its status
+        :param skip: Function that checks if a coupon should be skipped right before its turn
+        :return: Generator of dictionaries with each coupon code and its status
+        """
+
+        pending = list(coupons)
+        current = list()
+        self.start_time = self.start_time or time.monotonic()
+
+        def feed():
+            """
+            Helper generator that hands out the pending coupons at the learned pace
+
+            :return: Generator of coupon codes
+            """
+
+            while pending:
+                coupon = pending.pop(0)
+
+                if skip and skip(coupon):
+                    continue
+
+                self.acquire()
+                current.append(coupon)
+                yield coupon
+
+        while pending:
+            try:
+                for coupon_log in redeem(feed()):
+                    # Several coupons may be in flight at once, like across tabs
+                    for coupon in coupon_log:
+                        if coupon in current:
+                            current.remove(coupon)
+
+                    self.success()
+                    yield coupon_log
+
+            # If the limit was hit, park the coupons in flight, including the one
+            # that hit it, along with the remaining ones until the cooldown ends
+            except RateLimitError:
+                pending[:0] = current
+                current.clear()
+
+                cooldown = self.limited()
+
+                if self.cooldowns > self.max_cooldowns:
+                    raise Exception("Exceded maximum redeem attempts.")
+
+                logging.info(
+                    f"Redeem limit hit, parking {len(pending)} coupon(s) for {cooldown:.0f}s"
+                    + (f" and slowing down to {self.rate * 60:.1f} coupons/min."
+                       if self.paced else "."))
+
+                # Wake up early if the run is stopped,
+                # the next coupon then stops it
+                if self.stop:
+                    self.stop.wait(timeout=cooldown)
+
+                else:
+                    time.sleep(cooldown)
+
+    def report(self) -> str:
+        """
+        Returns the throughput achieved by the scheduler
+
+        :returns: Message with the throughput and the learned pace
+        """
+
+        elapsed = time.monotonic() - self.start_time if self.start_time else 0
+        throughput = self.redeemed / elapsed * 60 if elapsed else 0
+
+        return (f"Redeemed {self.redeemed} coupon(s) in {elapsed:.1f}s "
+                f"({throughput:.1f} coupons/min), "
+                + (f"pace {self.rate * 60:.1f} coupons/min." if self.paced else "unpaced."))
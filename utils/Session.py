@@ -0,0 +1,62 @@
+import json
+import os
+import re
+
+
+class Session:
+    """ A cache of the authenticated browser cookies of an account """
+
+    SESSION_DIRECTORY = "sessions"
+
+    def __init__(self, account: str):
+        """
+        Initializes a new instance of the Session class
+
+        :param account: Name of the account whose session is cached
+        """
+
+        # Replace any character that is not safe for a file name
+        file_name = re.sub(r"[^\w.@-]", "_", account)
+        self.session_file = os.path.join(
+            self.SESSION_DIRECTORY, f"{file_name}.json")
+
+    def load(self) -> list:
+        """
+        Loads the cached cookies of the account
+
+        :returns: List with the cached cookies,
+        or an empty list if no session was cached
+        """
+
+        try:
+            with open(self.session_file) as file:
+                return json.load(file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return list()
+
+    def save(self, cookies: list) -> None:
+        """
+        Saves the cookies of an authenticated browser
+
+        :param cookies: List with the browser cookies
+        :returns: None
+        """
+
+        os.makedirs(self.SESSION_DIRECTORY, exist_ok=True)
+
+        with open(self.session_file, "w+") as file:
+            json.dump(cookies, file)
+
+    def clear(self) -> None:
+        """
+        Removes the cached cookies of the account
+
+        :returns: None
+        """
+
+        try:
+            os.remove(self.session_file)
+
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,71 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import time
+
+
+class SteamGuard:
+    """ Generates the Steam Guard codes of an account from its mobile authenticator secret """
+
+    # Characters of the Steam Guard codes, without the ambiguous ones
+    CODE_CHARACTERS = "23456789BCDFGHJKMNPQRTVWXY"
+    CODE_LENGTH = 5
+
+    # Number of seconds each code is valid for
+    PERIOD = 30
+
+    def __init__(self, shared_secret: str):
+        """
+        Initializes a new instance of the SteamGuard class
+
+        :param shared_secret: Base64 encoded shared secret of the Steam mobile authenticator
+        """
+
+        try:
+            self.secret = base64.b64decode(shared_secret, validate=True)
+
+        # If the shared secret is not valid Base64,
+        # raise an exception
+        except (binascii.Error, TypeError):
+            raise Exception("Invalid Steam Guard shared secret.")
+
+        if not self.secret:
+            raise Exception("Invalid Steam Guard shared secret.")
+
+    def generate_code(self, timestamp: float = None) -> str:
+        """
+        Generates the Steam Guard code valid at the given time
+
+        :param timestamp: Unix time of the code, the current time if not provided
+        :returns: String with the Steam Guard code
+        """
+
+        counter = int((time.time() if timestamp is None else timestamp) // self.PERIOD)
+
+        digest = hmac.new(self.secret, struct.pack(">Q", counter), hashlib.sha1).digest()
+
+        # Dynamic truncation, as in HOTP
+        offset = digest[-1] & 0x0F
+        value = struct.unpack(">I", digest[offset:offset + 4])[0] & 0x7FFFFFFF
+
+        code = ""
+
+        for _ in range(self.CODE_LENGTH):
+            value, index = divmod(value, len(self.CODE_CHARACTERS))
+            code += self.CODE_CHARACTERS[index]
+
+        return code
+
+    def seconds_left(self, timestamp: float = None) -> float:
+        """
+        Returns the number of seconds the current code stays valid
+
+        :param timestamp: Unix time to check, the current time if not provided
+        :returns: Number of seconds until the next code
+        """
+
+        timestamp = time.time() if timestamp is None else timestamp
+
+        return self.PERIOD - timestamp % self.PERIOD
@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+
+
+class Storage:
+    """ Base class of the coupons log storage backends """
+
+    def __init__(self, account: str, log_file: str):
+        """
+        Initializes a new instance of the storage backend
+
+        :param account: Name of the account whose coupons are stored
+        :param log_file: Name of the account JSON log file, migrated by the other backends
+        """
+
+        self.account = account
+        self.log_file = log_file
+
+    def __contains__(self, coupon: str) -> bool:
+        return bool(self.get_many(coupons=[coupon]))
+
+    def get_many(self, coupons: list) -> dict:
+        """
+        Looks up several coupons at once
+
+        :param coupons: List with the coupon codes to look up
+        :returns: Dictionary with the stored coupon codes and their status
+        """
+
+        raise NotImplementedError
+
+    def add(self, coupons: dict) -> None:
+        """
+        Adds the given coupons and their status to the log
+
+        :param coupons: Dictionary with the coupon codes and their status
+        :returns: None
+        """
+
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """
+        Writes any pending change to disk
+
+        :returns: None
+        """
+
+        pass
+
+    def close(self) -> None:
+        """
+        Writes any pending change to disk and releases the storage
+
+        :returns: None
+        """
+
+        self.flush()
+
+    def load_legacy_log(self) -> dict:
+        """
+        Loads the account JSON log file to migrate it
+
+        :returns: Dictionary with the coupon codes and their status,
+        or an empty dictionary if the file does not exist or is empty
+        """
+
+        try:
+            with open(self.log_file) as file:
+                return json.load(file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
+
+
+class JsonStorage(Storage):
+    """ Stores the coupons log of an account in a single JSON file """
+
+    def __init__(self, account: str, log_file: str):
+        super().__init__(account=account, log_file=log_file)
+
+        self.log = self.load_legacy_log()
+        self.changed = False
+
+    def get_many(self, coupons: list) -> dict:
+        return {coupon: self.log[coupon] for coupon in coupons if coupon in self.log}
+
+    def add(self, coupons: dict) -> None:
+        if coupons:
+            self.log.update(coupons)
+            self.changed = True
+
+    def flush(self) -> None:
+
+        # If nothing was added,
+        # leave the file untouched
+        if not self.changed:
+            return
+
+        if os.path.dirname(self.log_file):
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+
+        with open(self.log_file, "w+") as file:
+            json.dump(self.log, file)
+
+        self.changed = False
+
+
+class JsonlStorage(Storage):
+    """ Stores the coupons log of every account in an append-only JSON lines file """
+
+    LOG_FILE = "log.jsonl"
+
+    # Appends from concurrent accounts must not interleave
+    lock = threading.Lock()
+
+    # Coupons of every account, shared by the libraries of the process, and the
+    # position in the log file up to which they were read
+    indexes = dict()
+    offset = 0
+
+    def __init__(self, account: str, log_file: str):
+        super().__init__(account=account, log_file=log_file)
+
+        with self.lock:
+            self.read_log()
+            self.index = self.indexes.setdefault(account, dict())
+            migrate = not self.index
+
+        # Migrate the account JSON log file on first use
+        if migrate:
+            self.add(coupons=self.load_legacy_log())
+
+    @classmethod
+    def read_log(cls) -> None:
+        """
+        Indexes the coupons of every account appended to the log file since the last read,
+        so that the log file is only read once in full, whatever the number of libraries opened
+
+        :returns: None
+        """
+
+        try:
+            # If the log file was replaced by a shorter one,
+            # index it again
+            if os.path.getsize(cls.LOG_FILE) < cls.offset:
+                cls.clear_indexes()
+
+            with open(cls.LOG_FILE, "rb") as file:
+                file.seek(cls.offset)
+
+                for line in file:
+                    # Leave a line still being written for the next read
+                    if not line.endswith(b"\n"):
+                        break
+
+                    cls.offset += len(line)
+
+                    try:
+                        entry = json.loads(line)
+
+                    # Skip a line left incomplete by an interrupted write
+                    except json.JSONDecodeError:
+                        continue
+
+                    # The last entry of a coupon holds its current status
+                    cls.indexes.setdefault(
+                        entry["account"], dict())[entry["coupon"]] = entry["status"]
+
+        except FileNotFoundError:
+            cls.clear_indexes()
+
+    @classmethod
+    def clear_indexes(cls) -> None:
+        """
+        Empties the coupons of every account, in place for the libraries still open
+
+        :returns: None
+        """
+
+        for index in cls.indexes.values():
+            index.clear()
+
+        cls.offset = 0
+
+    def get_many(self, coupons: list) -> dict:
+        return {coupon: self.index[coupon] for coupon in coupons if coupon in self.index}
+
+    def add(self, coupons: dict) -> None:
+
+        # Only append the coupons whose status changed
+        coupons = {coupon: status for coupon, status in coupons.items()
+                   if self.index.get(coupon) != status}
+
+        if not coupons:
+            return
+
+        lines = "".join(
+            json.dumps({"account": self.account, "coupon": coupon, "status": status}) + "\n"
+            for coupon, status in coupons.items())
+
+        with self.lock:
+            with open(self.LOG_FILE, "a") as file:
+                file.write(lines)
+
+            self.index.update(coupons)
+
+
+class SqliteStorage(Storage):
+    """ Stores the coupons log of every account in a SQLite database """
+
+    LOG_FILE = "log.db"
+
+    def __init__(self, account: str, log_file: str):
+        super().__init__(account=account, log_file=log_file)
+
+        # Only import SQLite when it is the selected backend
+        import sqlite3
+
+        # The library of an account may be used from a worker thread
+        self.connection = sqlite3.connect(
+            self.LOG_FILE, timeout=30, check_same_thread=False)
+
+        # Let concurrent accounts read while another one writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS coupons ("
+            "account TEXT NOT NULL, coupon TEXT NOT NULL, status TEXT NOT NULL, "
+            "PRIMARY KEY (account, coupon))")
+        self.connection.commit()
+
+        # Migrate the account JSON log file on first use
+        if not self.connection.execute(
+                "SELECT 1 FROM coupons WHERE account = ? LIMIT 1", (account,)).fetchone():
+            self.add(coupons=self.load_legacy_log())
+
+    def get_many(self, coupons: list) -> dict:
+        coupons = list(coupons)
+        found = dict()
+
+        # Stay under the SQLite limit of query parameters
+        for start in range(0, len(coupons), 500):
+            chunk = coupons[start:start + 500]
+
+            found.update(self.connection.execute(
+                f"SELECT coupon, status FROM coupons WHERE account = ? "
+                f"AND coupon IN ({', '.join('?' * len(chunk))})",
+                (self.account, *chunk)).fetchall())
+
+        return found
+
+    def add(self, coupons: dict) -> None:
+        if not coupons:
+            return
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO coupons (account, coupon, status) VALUES (?, ?, ?)",
+                [(self.account, coupon, status) for coupon, status in coupons.items()])
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+STORAGES = {
+    "json": JsonStorage,
+    "jsonl": JsonlStorage,
+    "sqlite": SqliteStorage
+}
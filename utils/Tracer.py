@@ -0,0 +1,226 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Tracer:
+    """ Records a timeline of the run in the Chrome trace event format """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the Tracer class, disabled until started
+        """
+
+        # Checked before any other work, so that tracing costs nothing while disabled
+        self.enabled = False
+        self.profiling = False
+
+        # Recorded from the worker threads
+        self.lock = threading.Lock()
+
+        self.events = list()
+        self.threads = dict()
+        self.profiles = list()
+
+        self.start_time = time.perf_counter()
+
+        # Returned by every span while tracing is disabled
+        self.disabled_span = contextlib.nullcontext()
+
+    def start(self, profile: bool = False) -> None:
+        """
+        Starts recording the timeline
+
+        :param profile: Also profile the Python functions of every run with cProfile
+        :returns: None
+        """
+
+        self.enabled = True
+        self.profiling = profile
+        self.start_time = time.perf_counter()
+
+    def add(self, name: str, category: str, start_time: float, end_time: float,
+            args: dict = None) -> None:
+        """
+        Records a complete event on the timeline of the current thread
+
+        :param name: Name of the event
+        :param category: Category of the event, like "stage" or "driver"
+        :param start_time: Performance counter value when the event started
+        :param end_time: Performance counter value when the event ended
+        :param args: Dictionary with the arguments shown with the event
+        :returns: None
+        """
+
+        thread = threading.current_thread()
+
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_time - self.start_time) * 1e6,
+            "dur": (end_time - start_time) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident
+        }
+
+        if args:
+            event["args"] = args
+
+        with self.lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def record(self, name: str, category: str, args: dict = None):
+        """
+        Records the wrapped block as an event, marking it if it raised an exception
+
+        :param name: Name of the event
+        :param category: Category of the event
+        :param args: Dictionary with the arguments shown with the event
+        :returns: Context manager timing the block
+        """
+
+        start_time = time.perf_counter()
+
+        try:
+            yield
+
+        except BaseException as e:
+            args = {**(args or dict()), "error": type(e).__name__}
+            raise
+
+        finally:
+            self.add(name=name, category=category, start_time=start_time,
+                     end_time=time.perf_counter(), args=args)
+
+    def span(self, name: str, category: str = "stage", **args):
+        """
+        Returns a context manager recording the wrapped block,
+        which does nothing while tracing is disabled
+
+        :param name: Name of the event
+        :param category: Category of the event
+        :param args: Arguments shown with the event
+        :returns: Context manager timing the block
+        """
+
+        if not self.enabled:
+            return self.disabled_span
+
+        return self.record(name=name, category=category, args=args)
+
+    def instrument(self, instance, methods: list, category: str, name=None) -> None:
+        """
+        Records every call to the given methods of an instance, if tracing is enabled
+
+        :param instance: Object whose methods are recorded
+        :param methods: List with the names of the methods
+        :param category: Category of the events
+        :param name: Function returning the event name from the method name and its
+        arguments, the method name if not provided
+        :returns: None
+        """
+
+        # Leave the methods untouched while tracing is disabled
+        if not self.enabled:
+            return
+
+        def traced(method_name, method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                event_name = name(method_name, *args, **kwargs) if name else method_name
+
+                with self.record(name=event_name, category=category):
+                    return method(*args, **kwargs)
+
+            return wrapper
+
+        for method_name in methods:
+            setattr(instance, method_name,
+                    traced(method_name, getattr(instance, method_name)))
+
+    @contextlib.contextmanager
+    def profile(self):
+        """
+        Profiles the Python functions called by the wrapped block with cProfile,
+        if profiling is enabled, each thread needs its own profiler
+
+        :returns: Context manager profiling the block
+        """
+
+        if not self.profiling:
+            yield
+            return
+
+        # Only import the profiler once profiling is enabled
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+        try:
+            profiler.enable()
+
+        # If the Python version only allows a single profiler at a time,
+        # which then profiles every thread, leave the block to it
+        except ValueError:
+            yield
+            return
+
+        try:
+            yield
+
+        finally:
+            profiler.disable()
+
+            with self.lock:
+                self.profiles.append(profiler)
+
+    def write_file(self, file_name: str) -> None:
+        """
+        Writes the recorded timeline to a JSON file, to open in a trace viewer
+        like chrome://tracing or Perfetto
+
+        :param file_name: Name of the trace file
+        :returns: None
+        """
+
+        with self.lock:
+            # Name the timeline of each thread
+            events = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident,
+                       "args": {"name": thread_name}}
+                      for ident, thread_name in self.threads.items()] + self.events
+
+        with open(file_name, "w+") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def write_profile(self, file_name: str) -> None:
+        """
+        Merges the profiles of every thread and writes them to a pstats file
+
+        :param file_name: Name of the profile file
+        :returns: None
+        """
+
+        import pstats
+
+        with self.lock:
+            profiles = list(self.profiles)
+
+        if not profiles:
+            return
+
+        stats = pstats.Stats(profiles[0])
+
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+
+        stats.dump_stats(file_name)
+
+
+# Shared by every module of the process
+TRACER = Tracer()
@@ -0,0 +1,237 @@
+import logging
+import random
+import time
+
+from utils.Intake import Intake
+from utils.Launcher import Launcher
+from utils.Library import Library
+from utils.Metrics import METRICS
+from utils.Outcomes import Outcomes
+from utils.Pool import Pool
+from utils.Requester import Requester
+
+
+class Watcher:
+    """ Polls the coupons API, or receives pushed coupons, and redeems new coupons
+    as soon as they appear """
+
+    MAX_BACKOFF = 900
+
+    # Number of seconds the failed accounts back off from, when the API is not polled
+    RETRY_INTERVAL = 60
+
+    def __init__(self, accounts: dict, interval: float = 60, workers: int = 1,
+                 storage: str = "json", prefetch: bool = True, region: str = None,
+                 metrics_file: str = None, intake: Intake = None, **options):
+        """
+        Initializes a new instance of the Watcher class
+
+        :param accounts: Dictionary with the account names and their user credentials
+        :param interval: Number of seconds between polls, the API is never polled
+        if not provided, only the pushed coupons are redeemed
+        :param workers: Maximum number of accounts redeemed at the same time
+        :param storage: Name of the coupons log storage backend
+        :param prefetch: Start the browsers while the coupons are still being requested
+        :param region: Region of the coupons to redeem, any region if not provided
+        :param metrics_file: Name of the file the metrics are written to after every poll
+        :param intake: Intake of the pushed coupons, redeemed between the polls
+        :param options: Keyword arguments passed on to every worker
+        """
+
+        self.accounts = accounts
+        self.interval = interval
+        self.workers = workers
+        self.prefetch = prefetch
+        self.region = region
+        self.metrics_file = metrics_file
+        self.intake = intake
+        self.options = options
+
+        # Browsers kept between the polls, if enabled
+        self.lifecycle = options.get("lifecycle")
+
+        # Coupons of the last changed poll, and the pushed ones,
+        # retried on the accounts whose run did not redeem them all
+        self.coupons = list()
+
+        # Consecutive failed runs of each account, and when it may run again,
+        # so that a permanent failure like a wrong password does not log in on every poll
+        self.account_failures = dict()
+        self.account_retry_times = dict()
+
+        # Share the coupons found invalid between the accounts
+        self.outcomes = Outcomes()
+        self.options["outcomes"] = self.outcomes
+
+        # Keep the coupons log of every account region loaded between polls
+        self.libraries = {
+            account: {
+                region: Library(account=account, storage=storage,
+                                outcomes=self.outcomes, region=region)
+                for region in user_credentials.get("regions") or [Library.DEFAULT_REGION]}
+            for account, user_credentials in accounts.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        for libraries in self.libraries.values():
+            for library in libraries.values():
+                library.close()
+
+        self.outcomes.update_file()
+
+    def get_delay(self, failures: int, interval: float = None) -> float:
+        """
+        Returns the number of seconds to wait before the next poll, backing off
+        exponentially after consecutive failures, with a random jitter
+
+        :param failures: Number of consecutive failed polls
+        :param interval: Number of seconds to wait without failures,
+        the poll interval if not provided
+        :returns: Number of seconds to wait
+        """
+
+        delay = min((interval or self.interval) * 2 ** failures, self.MAX_BACKOFF)
+
+        # Spread the polls to avoid hitting the API at fixed times
+        return random.uniform(0.8 * delay, 1.2 * delay)
+
+    def get_pending_accounts(self) -> dict:
+        """
+        Returns the accounts that have not redeemed every known coupon on all of their
+        regions yet, like after a failed login or a browser crash
+
+        :returns: Dictionary with the account names and their user credentials
+        """
+
+        return {account: user_credentials
+                for account, user_credentials in self.get_ready_accounts().items()
+                if any(library.filter_coupons(coupons=self.coupons)
+                       for library in self.libraries[account].values())}
+
+    def get_ready_accounts(self) -> dict:
+        """
+        Returns the accounts that are not backing off after failed runs
+
+        :returns: Dictionary with the account names and their user credentials
+        """
+
+        now = time.monotonic()
+
+        return {account: user_credentials
+                for account, user_credentials in self.accounts.items()
+                if self.account_retry_times.get(account, 0) <= now}
+
+    def update_failures(self, results: dict) -> None:
+        """
+        Counts the consecutive failed runs of each account, backing it off
+        exponentially, and resets the count once a run succeeds
+
+        :param results: Dictionary with the account names and their results
+        :returns: None
+        """
+
+        for account, result in results.items():
+            if not result["error"]:
+                self.account_failures.pop(account, None)
+                self.account_retry_times.pop(account, None)
+                continue
+
+            failures = self.account_failures.get(account, 0) + 1
+            delay = self.get_delay(
+                failures=failures, interval=self.interval or self.RETRY_INTERVAL)
+
+            self.account_failures[account] = failures
+            self.account_retry_times[account] = time.monotonic() + delay
+
+            logging.info(
+                f"[{account}] Backing off for {delay:.0f}s after {failures} failed run(s).")
+
+    def run(self) -> None:
+        """
+        Polls the coupons API until interrupted, redeeming the new coupons on every account,
+        and the pushed coupons as soon as they arrive
+
+        :returns: None
+        """
+
+        failures = 0
+        next_poll = time.monotonic()
+
+        with Requester(region=self.region) as requester, \
+                Pool(workers=self.workers, **self.options) as pool:
+
+            while True:
+                with Launcher(count=min(self.workers, len(self.accounts)),
+                              bot_options=self.options.get("bot_options")) as launcher:
+                    coupons = None
+                    pushed = None
+                    accounts = self.get_ready_accounts()
+
+                    # Only start browsers in the background
+                    # if none is kept from the previous polls
+                    prefetch = self.prefetch and not (self.lifecycle and self.lifecycle.idle)
+
+                    if self.interval and time.monotonic() >= next_poll:
+                        try:
+                            # Start the browsers as soon as any source changed
+                            coupons = requester.poll_coupons(
+                                on_change=launcher.start if prefetch else None)
+                            failures = 0
+
+                        # If the request failed,
+                        # back off before the next poll
+                        except Exception as e:
+                            failures += 1
+                            logging.error(f"Failed to retrieve coupons. {e}")
+
+                        next_poll = time.monotonic() + self.get_delay(failures=failures)
+
+                        if coupons:
+                            self.coupons = coupons
+
+                        # If nothing changed, retry the accounts
+                        # whose previous run left coupons to redeem
+                        elif self.coupons:
+                            # Drop the coupons that expired since
+                            self.coupons = requester.screen_coupons(coupons=self.coupons)
+                            accounts = self.get_pending_accounts()
+
+                            if accounts:
+                                logging.info(
+                                    f"Retrying {len(accounts)} account(s) "
+                                    "with coupons left to redeem...")
+                                coupons = self.coupons
+
+                    # Wait for pushed coupons until the next poll,
+                    # starting the browsers while a burst settles
+                    elif self.intake:
+                        coupons = pushed = self.intake.next_batch(
+                            timeout=next_poll - time.monotonic() if self.interval else None,
+                            on_push=launcher.start if prefetch else None)
+
+                        known = {coupon.code for coupon in self.coupons}
+                        self.coupons = self.coupons + [
+                            coupon for coupon in pushed if coupon.code not in known]
+
+                    else:
+                        time.sleep(max(next_poll - time.monotonic(), 0))
+                        continue
+
+                    try:
+                        if coupons and accounts:
+                            results = pool.run(
+                                accounts=accounts, coupons=coupons,
+                                libraries=self.libraries, launcher=launcher)
+                            pool.report(results=results)
+                            self.update_failures(results=results)
+                            self.outcomes.update_file()
+
+                    finally:
+                        # Let the pushed coupons be pushed again
+                        if pushed:
+                            self.intake.done(batch=pushed)
+
+                if self.metrics_file:
+                    METRICS.write_file(file_name=self.metrics_file)
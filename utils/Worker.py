@@ -0,0 +1,419 @@
+import contextlib
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.Bot import Bot
+from utils.Journal import Journal
+from utils.Launcher import Launcher
+from utils.Library import Library
+from utils.Lifecycle import Lifecycle
+from utils.Metrics import METRICS
+from utils.Outcomes import Outcomes
+from utils.Redeemer import Redeemer
+from utils.Scheduler import RateLimitError, Scheduler
+from utils.Session import Session
+from utils.Tracer import TRACER
+
+
+class Worker:
+    """ Redeems the new coupons of a single account """
+
+    def __init__(self, account: str, user_credentials: dict, http: bool = False,
+                 storage: str = "json", bot_options: dict = None, outcomes: Outcomes = None,
+                 scheduler_options: dict = None, lifecycle: Lifecycle = None,
+                 stop: threading.Event = None):
+        """
+        Initializes a new instance of the Worker class
+
+        :param account: Name of the account
+        :param user_credentials: Validated credentials of the account
+        :param http: Submit the coupons with plain HTTP requests after login,
+        falling back to the browser if the requests fail
+        :param storage: Name of the coupons log storage backend
+        :param bot_options: Keyword arguments passed on to the bot
+        :param outcomes: Cache of the coupon outcomes shared by every account
+        :param scheduler_options: Keyword arguments passed on to the redeem scheduler
+        :param lifecycle: Lifecycle manager keeping the browser of the account between runs,
+        the browser is closed at the end of each run if not provided
+        :param stop: Event set to stop the run before the next coupon,
+        like when the account was handed to another worker
+        """
+
+        self.account = account
+        self.user_credentials = user_credentials
+        self.http = http
+        self.storage = storage
+        self.bot_options = bot_options or dict()
+        self.outcomes = outcomes
+        self.scheduler_options = scheduler_options or dict()
+        self.lifecycle = lifecycle
+        self.stop = stop
+        self.session = Session(account=account)
+
+        # The regions share the browser of the account
+        self.bot_lock = threading.Lock()
+
+    def get_regions(self) -> list:
+        """
+        Returns the regions the coupons of the account are redeemed on
+
+        :returns: List with the regions of the account
+        """
+
+        return self.user_credentials.get("regions") or [Library.DEFAULT_REGION]
+
+    def login(self, bot: Bot, region: str = None) -> None:
+        """
+        Login in to the account with the bot, restoring the cached session
+        if it is still valid, or using the account provider credentials
+
+        :param bot: Bot instance to login with
+        :param region: Region of the coupon redeem page used to check the cached session
+        :returns: None
+        """
+
+        cookies = self.session.load()
+
+        # If the cached session is still logged in,
+        # skip the account provider login
+        if cookies and bot.restore_session(cookies=cookies, region=region):
+            logging.info(f"[{self.account}] Restored cached session.")
+            return
+
+        # If the cached session expired,
+        # remove it and fall back to a full login
+        if cookies:
+            logging.info(f"[{self.account}] Cached session expired.")
+            self.session.clear()
+
+        self.provider_login(bot=bot)
+
+        # Cache the authenticated session for the next run
+        self.session.save(cookies=bot.get_cookies())
+
+    def provider_login(self, bot: Bot) -> None:
+        """
+        Login in to the account with the bot, using the account provider credentials
+
+        :param bot: Bot instance to login with
+        :returns: None
+        """
+
+        # Login in to Steam account using the provided username and password
+        if self.user_credentials.get("steam"):
+            logging.info(f"[{self.account}] Logging in to Steam account...")
+            bot.steam_account_login(*self.user_credentials["steam"])
+
+        # Login in to Pearl Abyss account using the provided email and password
+        elif self.user_credentials.get("pearl_abyss"):
+            logging.info(
+                f"[{self.account}] Logging in to Pearl Abyss account...")
+            # TODO: Add support for PA account login
+            bot.pa_account_login(*self.user_credentials["pearl_abyss"])
+
+    def create_redeemer(self, bot: Bot, region: str = None) -> Redeemer:
+        """
+        Creates an HTTP redeemer with the session of the logged in bot
+
+        :param bot: Logged in bot instance
+        :param region: Region of the coupon redeem page
+        :returns: Redeemer instance, or None if the coupon form is not supported
+        """
+
+        try:
+            return Redeemer(
+                cookies=bot.get_cookies(),
+                user_agent=bot.driver.execute_script(
+                    "return navigator.userAgent;"),
+                coupon_form=bot.get_coupon_form(region=region),
+                submit_dialog=bot.SUBMIT_DIALOG)
+
+        # If the coupon form can not be submitted over HTTP,
+        # use the browser instead
+        except Exception as e:
+            logging.info(
+                f"[{self.account}] HTTP redeem unavailable, using browser. {e}")
+            return None
+
+    def should_skip(self, coupon: str, region: str = None) -> bool:
+        """
+        Checks right before its turn if a coupon should be skipped,
+        stopping the run instead if it was asked to stop
+
+        :param coupon: The coupon code to check
+        :param region: Region the coupon is redeemed on
+        :returns: True if the coupon should be skipped
+        """
+
+        # If the run was asked to stop,
+        # raise an exception before redeeming anything else
+        if self.stop and self.stop.is_set():
+            raise Exception("Run stopped.")
+
+        return self.is_known_invalid(coupon=coupon, region=region)
+
+    def is_known_invalid(self, coupon: str, region: str = None) -> bool:
+        """
+        Checks if another account already found the coupon to be invalid on the region,
+        possibly while this account was redeeming its previous coupons
+
+        :param coupon: The coupon code to check
+        :param region: Region the coupon is redeemed on, the default region if not provided
+        :returns: True if the coupon has a shared outcome on the region
+        """
+
+        if self.outcomes and self.outcomes.get_many(
+                coupons=[coupon], region=region or Library.DEFAULT_REGION):
+            logging.info(
+                f"[{self.account}] Skipped coupon {coupon}, found invalid by another account.")
+            return True
+
+        return False
+
+    def add_coupon_log(self, coupons_log: dict, coupon_log: dict, journal: Journal = None,
+                       region: str = None) -> None:
+        """
+        Adds the status of a coupon to the log and the journal, sharing it right away
+        with the other accounts if it applies to every account
+
+        :param coupons_log: Dictionary with the coupon codes redeemed and their status
+        :param coupon_log: Dictionary with the coupon code and its status
+        :param journal: Journal of the account
+        :param region: Region the coupon was redeemed on, the default region if not provided
+        :returns: None
+        """
+
+        coupons_log.update(coupon_log)
+
+        for status in coupon_log.values():
+            METRICS.count(status=status)
+
+        if journal:
+            journal.append(coupons=coupon_log)
+
+        if self.outcomes:
+            self.outcomes.add(coupons=coupon_log, region=region or Library.DEFAULT_REGION)
+
+    def redeem_coupons(self, bot: Bot, coupons: list, journal: Journal = None,
+                       region: str = None, redeemer: Redeemer = None) -> dict:
+        """
+        Redeems the coupons with the logged in bot, over HTTP if enabled,
+        falling back to the browser if an HTTP request fails,
+        at a pace that adapts to the website redeem limit
+
+        :param bot: Logged in bot instance
+        :param coupons: List with the coupons to redeem
+        :param journal: Journal recording each coupon status as soon as it is known
+        :param region: Region of the coupon redeem page
+        :param redeemer: HTTP redeemer already created for the region, created here if not provided
+        :returns: Dictionary with the coupon codes redeemed and their status
+        """
+
+        coupons_log = dict()
+
+        if self.http and not redeemer:
+            redeemer = self.create_redeemer(bot=bot, region=region)
+
+        def redeem(batch):
+            """
+            Helper generator that redeems a batch of coupons
+
+            :param batch: Iterable with the coupon codes to redeem
+            :return: Generator of dictionaries with each coupon code and its status
+            """
+
+            nonlocal redeemer
+
+            for coupon in batch:
+                if redeemer:
+                    try:
+                        yield redeemer.redeem_coupon(coupon=coupon)
+                        continue
+
+                    except RateLimitError:
+                        raise
+
+                    # If the HTTP request failed, use the browser
+                    # for this coupon and the remaining ones
+                    except Exception as e:
+                        logging.info(
+                            f"[{self.account}] HTTP redeem failed, using browser. {e}")
+                        redeemer.session.close()
+                        redeemer = None
+
+                # Redeem the remaining coupons on the same coupon redeem page,
+                # one region at a time as they share the browser
+                with self.bot_lock:
+                    yield from bot.redeem_coupons(
+                        coupons=itertools.chain([coupon], batch), region=region)
+                return
+
+        scheduler = Scheduler(stop=self.stop, **self.scheduler_options)
+
+        try:
+            # Skip the coupons found invalid by another account in the meantime
+            for coupon_log in scheduler.run(
+                    coupons=coupons, redeem=redeem,
+                    skip=lambda coupon: self.should_skip(coupon=coupon, region=region)):
+                self.add_coupon_log(coupons_log=coupons_log, coupon_log=coupon_log,
+                                    journal=journal, region=region)
+
+        finally:
+            if journal:
+                journal.flush()
+
+            if redeemer:
+                redeemer.session.close()
+
+            logging.info(f"[{self.account}] [{region or Library.DEFAULT_REGION}] "
+                         f"{scheduler.report()}")
+            scheduler.update_file()
+
+        return coupons_log
+
+    def redeem_regions(self, bot: Bot, coupons: dict, libraries: dict) -> dict:
+        """
+        Redeems the coupons of every region with the logged in bot, the regions
+        are redeemed concurrently over HTTP if enabled, and one after the other otherwise
+
+        :param bot: Logged in bot instance
+        :param coupons: Dictionary with the regions and their coupon codes to redeem
+        :param libraries: Dictionary with the regions and their loaded libraries
+        :returns: Dictionary with the regions and their coupons log
+        """
+
+        # A single region, or the browser alone, can not be redeemed concurrently
+        if not self.http or len(coupons) == 1:
+            return {region: self.redeem_coupons(
+                        bot=bot, coupons=region_coupons,
+                        journal=libraries[region].journal, region=region)
+                    for region, region_coupons in coupons.items()}
+
+        # Read the coupon form of each region first, as it requires the browser
+        redeemers = {region: self.create_redeemer(bot=bot, region=region)
+                     for region in coupons}
+
+        with ThreadPoolExecutor(max_workers=len(coupons),
+                                thread_name_prefix=f"Worker-{self.account}") as executor:
+            futures = {
+                region: executor.submit(
+                    self.redeem_coupons, bot=bot, coupons=region_coupons,
+                    journal=libraries[region].journal, region=region,
+                    redeemer=redeemers[region])
+                for region, region_coupons in coupons.items()}
+
+            return {region: future.result() for region, future in futures.items()}
+
+    def run(self, coupons: list, libraries: dict = None, launcher: Launcher = None) -> dict:
+        """
+        Filters out the coupons already in the account log of each region,
+        redeems the new ones and adds them to the account log of their region
+
+        :param coupons: List with the active coupons
+        :param libraries: Dictionary with the regions of the account and their loaded
+        libraries, loaded from their log files if not provided
+        :param launcher: Launcher with bots started in the background,
+        the worker starts its own bot if none is available
+        :returns: Dictionary with the regions and their coupon codes redeemed and status
+        """
+
+        # Put the account run on the timeline, and profile it, if enabled
+        with TRACER.span(name="account", account=self.account), TRACER.profile():
+            if libraries:
+                return self.run_libraries(
+                    coupons=coupons, libraries=libraries, launcher=launcher)
+
+            with contextlib.ExitStack() as stack:
+                libraries = {
+                    region: stack.enter_context(Library(
+                        account=self.account, storage=self.storage,
+                        outcomes=self.outcomes, region=region))
+                    for region in self.get_regions()}
+
+                return self.run_libraries(
+                    coupons=coupons, libraries=libraries, launcher=launcher)
+
+    def run_libraries(self, coupons: list, libraries: dict, launcher: Launcher = None) -> dict:
+        """
+        Redeems the new coupons of each region and adds them to the given libraries
+
+        :param coupons: List with the active coupons
+        :param libraries: Dictionary with the regions of the account and their loaded libraries
+        :param launcher: Launcher with bots started in the background,
+        the worker starts its own bot if none is available
+        :returns: Dictionary with the regions and their coupon codes redeemed and status
+        """
+
+        # Keep the regions with new coupons
+        new_coupons = dict()
+
+        for region, library in libraries.items():
+            region_coupons = library.filter_coupons(coupons=coupons)
+
+            if region_coupons:
+                new_coupons[region] = [coupon.code for coupon in region_coupons]
+
+        # If there are no new coupons,
+        # skip the browser entirely
+        if not new_coupons:
+            logging.info(f"[{self.account}] No new coupons available.")
+            return dict()
+
+        logging.info(
+            f"[{self.account}] Found {sum(map(len, new_coupons.values()))} new coupon(s) "
+            f"to redeem on {', '.join(new_coupons)}.")
+
+        def create_bot() -> Bot:
+            """
+            Helper function that takes a bot already started in the background, if any,
+            or starts a new one
+
+            :return: Bot instance
+            """
+
+            return (launcher.acquire() if launcher else None) or Bot(**self.bot_options)
+
+        # Keep the browser for the next run of the account, if enabled,
+        # a recycled browser restores the cached session on login
+        with self.lifecycle.lease(account=self.account, create=create_bot) \
+                if self.lifecycle else create_bot() as bot:
+
+            try:
+                # The same session is logged in on every region
+                self.login(bot=bot, region=next(iter(new_coupons)))
+
+            # If the login attempt failed,
+            # stop the account run
+            except Exception as e:
+                raise Exception(f"Login failed. {e}")
+
+            # If the login was successful,
+            # redeem the coupons
+            logging.info(f"[{self.account}] Redeeming coupons...")
+
+            try:
+                # Attempt to redeem the coupons and add them to the log,
+                # journaling each one so that an interrupted run resumes where it stopped
+                coupons_logs = self.redeem_regions(
+                    bot=bot, coupons=new_coupons, libraries=libraries)
+
+            # If the attempt failed, keep the coupons redeemed so far
+            # and stop the account run
+            except Exception as e:
+                for library in libraries.values():
+                    library.add_coupons(coupons=library.journal.replay())
+                    library.update_files()
+
+                raise Exception(f"Redeeming process failed. {e}")
+
+            # Keep the cookies set by the coupon redeem page of every region
+            self.session.save(cookies=bot.get_cookies())
+
+        # Add the coupons to the log file of their region
+        for region, coupons_log in coupons_logs.items():
+            libraries[region].add_coupons(coupons=coupons_log)
+            libraries[region].update_files()
+
+        return coupons_logs